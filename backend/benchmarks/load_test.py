@@ -0,0 +1,471 @@
+"""
+Load test for the shop API.
+
+Starts the app locally (or targets a running one with --url), seeds a catalog
+and order history of the requested size, then drives a weighted mix of
+storefront reads, promocode checks and checkouts at each concurrency level.
+Latency percentiles and throughput are printed per route and written as JSON
+so runs can be compared with --compare.
+
+    python benchmarks/load_test.py                                # memory backend
+    python benchmarks/load_test.py --backend mongo --products 5000 --orders 20000
+    python benchmarks/load_test.py --concurrency 1,16,64 --duration 30 --mix checkout
+    python benchmarks/load_test.py --compare results/before.json results/after.json
+
+The mongo and mariadb backends read their connection settings from the
+environment (see storage/__init__.py); the database named by DB_NAME is wiped
+before seeding, so point it at a scratch database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ADMIN_AUTH = ("armanuha", "secretboost1")
+BATCH_SIZE = 500
+PERCENTILES = (50, 95, 99)
+
+# Relative weights of each scenario, per mix
+MIXES = {
+    # Mostly browsing, as the storefront sees it
+    "storefront": {
+        "categories": 15,
+        "products": 20,
+        "products_by_category": 20,
+        "products_next_page": 5,
+        "product": 20,
+        "about": 5,
+        "validate_promocode": 5,
+        "quote": 5,
+        "create_order": 5,
+    },
+    # Heavier on the cart and checkout path
+    "checkout": {
+        "categories": 5,
+        "products": 5,
+        "products_by_category": 5,
+        "product": 15,
+        "validate_promocode": 20,
+        "quote": 25,
+        "create_order": 25,
+    },
+}
+
+
+class Catalog:
+    """Ids the scenarios pick from, filled in by seeding or discovery."""
+
+    def __init__(self, categories, products, promocodes):
+        self.categories = categories
+        self.products = products
+        self.promocodes = promocodes
+
+    def cart(self, rng: random.Random) -> list:
+        items = []
+        for product in rng.sample(self.products, min(len(self.products), rng.randint(1, 4))):
+            weights = product.get("weight_prices") or []
+            items.append({
+                "product_id": product["id"],
+                "weight": rng.choice(weights)["weight"] if weights else None,
+                "quantity": rng.randint(1, 3),
+            })
+        return items
+
+    def promocode(self, rng: random.Random):
+        return rng.choice(self.promocodes) if self.promocodes and rng.random() < 0.5 else None
+
+
+# Scenarios: each returns (route, method, path, kwargs)
+def scenario_categories(catalog, rng):
+    return "GET /api/categories", "GET", "/api/categories", {}
+
+
+def scenario_products(catalog, rng):
+    return "GET /api/products", "GET", "/api/products", {"params": {"limit": 20}}
+
+
+def scenario_products_by_category(catalog, rng):
+    params = {"limit": 20, "category_id": rng.choice(catalog.categories)}
+    return "GET /api/products?category_id", "GET", "/api/products", {"params": params}
+
+
+def scenario_products_next_page(catalog, rng):
+    # The cursor is taken from a first page fetched by the worker
+    return "GET /api/products?cursor", "GET", "/api/products", {"params": {"limit": 20}, "follow_cursor": True}
+
+
+def scenario_product(catalog, rng):
+    product = rng.choice(catalog.products)
+    return "GET /api/products/{id}", "GET", f"/api/products/{product['id']}", {}
+
+
+def scenario_about(catalog, rng):
+    return "GET /api/about", "GET", "/api/about", {}
+
+
+def scenario_validate_promocode(catalog, rng):
+    code = rng.choice(catalog.promocodes) if catalog.promocodes else "NOPE"
+    body = {"code": code, "subtotal": rng.randint(1000, 20000)}
+    return "POST /api/promocodes/validate", "POST", "/api/promocodes/validate", {"json": body}
+
+
+def scenario_quote(catalog, rng):
+    body = {"items": catalog.cart(rng), "promocode": catalog.promocode(rng)}
+    return "POST /api/orders/quote", "POST", "/api/orders/quote", {"json": body}
+
+
+def scenario_create_order(catalog, rng):
+    body = {
+        "customer_name": f"Load test {rng.randint(1, 10 ** 6)}",
+        "customer_phone": f"+7700{rng.randint(0, 9999999):07d}",
+        "items": catalog.cart(rng),
+        "promocode": catalog.promocode(rng),
+    }
+    return "POST /api/orders", "POST", "/api/orders", {"json": body}
+
+
+SCENARIOS = {name[len("scenario_"):]: fn for name, fn in globals().items() if name.startswith("scenario_")}
+
+
+# Local server
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(backend: str, workers: int, port: int, tmp: Path) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        STORAGE_BACKEND=backend,
+        IMAGE_STORE_DIR=str(tmp / "uploads"),
+        IMAGE_CACHE_DIR=str(tmp / "image_cache"),
+    )
+    env.setdefault("DB_NAME", "medovik_loadtest")
+    command = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_until_ready(base_url: str, process=None, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready in {timeout}s")
+
+
+# Seeding
+def batch(session: requests.Session, base_url: str, operations: list) -> list:
+    ids = []
+    for start in range(0, len(operations), BATCH_SIZE):
+        response = session.post(
+            f"{base_url}/api/admin/batch", json={"operations": operations[start:start + BATCH_SIZE]}
+        )
+        response.raise_for_status()
+        ids.extend(result["id"] for result in response.json()["results"])
+    return ids
+
+
+def seed(base_url: str, args, rng: random.Random) -> Catalog:
+    session = requests.Session()
+    session.auth = ADMIN_AUTH
+    session.delete(f"{base_url}/api/data/all").raise_for_status()
+
+    categories = batch(session, base_url, [
+        {"op": "create", "collection": "categories", "data": {"name": f"Категория {n}", "slug": f"category-{n}"}}
+        for n in range(args.categories)
+    ])
+    products = []
+    for n in range(args.products):
+        base_price = rng.randint(5, 100) * 100
+        weights = [
+            {"weight": f"{grams}гр", "price": base_price * grams // 250}
+            for grams in rng.sample([250, 340, 550, 750, 1000], rng.randint(0, 4))
+        ]
+        products.append({
+            "name": f"Товар {n}",
+            "description": "Описание товара для нагрузочного теста. " * 4,
+            "category_id": rng.choice(categories),
+            "image": f"https://images.example.com/product-{n}.jpg",
+            "base_price": base_price,
+            "weight_prices": weights,
+        })
+    product_ids = batch(session, base_url, [
+        {"op": "create", "collection": "products", "data": data} for data in products
+    ])
+    for product, product_id in zip(products, product_ids):
+        product["id"] = product_id
+    codes = [f"LOAD{n}" for n in range(args.promocodes)]
+    batch(session, base_url, [
+        {"op": "create", "collection": "promocodes",
+         "data": {"code": code, "discount_type": "percent", "discount_value": 10, "max_uses": 10 ** 9}}
+        for code in codes
+    ])
+    catalog = Catalog(categories, products, codes)
+
+    # Order history goes through the public endpoint so it is priced like real orders
+    def place(n):
+        order_rng = random.Random(args.seed_value + n)
+        _, method, path, kwargs = scenario_create_order(catalog, order_rng)
+        requests.request(method, f"{base_url}{path}", timeout=30, **kwargs).raise_for_status()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(place, range(args.orders)))
+    return catalog
+
+
+def discover(base_url: str) -> Catalog:
+    """Build the catalog from an already populated server."""
+    categories = [c["id"] for c in requests.get(f"{base_url}/api/categories").json()]
+    products, cursor = [], None
+    while True:
+        params = {"limit": 500, **({"cursor": cursor} if cursor else {})}
+        response = requests.get(f"{base_url}/api/products", params=params)
+        response.raise_for_status()
+        products.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    promos = requests.get(f"{base_url}/api/promocodes", auth=ADMIN_AUTH)
+    codes = [p["code"] for p in promos.json()] if promos.ok else []
+    if not categories or not products:
+        raise RuntimeError("The server has no catalog; run with --seed")
+    return Catalog(categories, products, codes)
+
+
+# Load generation
+def run_level(base_url: str, catalog: Catalog, mix: dict, concurrency: int, duration: float,
+              warmup: float, seed_value: int) -> dict:
+    names, weights = zip(*mix.items())
+    samples = {}  # route -> list of (latency, ok)
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed_value * 1000 + worker_id)
+        session = requests.Session()
+        local = {}
+        while True:
+            route, method, path, kwargs = SCENARIOS[rng.choices(names, weights)[0]](catalog, rng)
+            if kwargs.pop("follow_cursor", False):
+                first = session.get(f"{base_url}{path}", params=kwargs["params"])
+                cursor = first.headers.get("X-Next-Cursor")
+                if cursor:
+                    kwargs["params"] = {**kwargs["params"], "cursor": cursor}
+            began = time.monotonic()
+            if began >= stop_at:
+                break
+            try:
+                response = session.request(method, f"{base_url}{path}", timeout=30, **kwargs)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            ended = time.monotonic()
+            if began >= measure_from:
+                local.setdefault(route, []).append((ended - began, ok))
+        with lock:
+            for route, values in local.items():
+                samples.setdefault(route, []).extend(values)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(time.monotonic() - measure_from, 1e-9)
+
+    routes = {route: summarize(values, elapsed) for route, values in sorted(samples.items())}
+    total = summarize([v for values in samples.values() for v in values], elapsed)
+    return {"concurrency": concurrency, "duration": round(elapsed, 3), "total": total, "routes": routes}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(values: list, elapsed: float) -> dict:
+    latencies = sorted(latency for latency, _ in values)
+    summary = {
+        "requests": len(values),
+        "errors": sum(1 for _, ok in values if not ok),
+        "throughput": round(len(values) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 3)
+    summary["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else 0.0
+    return summary
+
+
+# Reporting
+def print_level(level: dict):
+    print(f"\nconcurrency {level['concurrency']}, {level['duration']:.1f}s")
+    header = f"{'route':<34}{'req':>8}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for route, s in [*level["routes"].items(), ("total", level["total"])]:
+        print(f"{route:<34}{s['requests']:>8}{s['errors']:>6}{s['throughput']:>10.1f}"
+              f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def compare(before_path: str, after_path: str):
+    before = json.loads(Path(before_path).read_text())
+    after = json.loads(Path(after_path).read_text())
+    old_levels = {level["concurrency"]: level for level in before["levels"]}
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for level in after["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"\nconcurrency {level['concurrency']}")
+        header = f"{'route':<34}{'req/s':>12}{'':17}{'p95 ms':>12}{'':17}"
+        print(header)
+        print("-" * len(header))
+        rows = [*level["routes"].items(), ("total", level["total"])]
+        for route, new in rows:
+            prev = old["total"] if route == "total" else old["routes"].get(route)
+            if prev is None:
+                continue
+            print(f"{route:<34}"
+                  f"{prev['throughput']:>9.1f} → {new['throughput']:<8.1f}{change(prev['throughput'], new['throughput']):>9}"
+                  f"{prev['p95_ms']:>9.2f} → {new['p95_ms']:<8.2f}{change(prev['p95_ms'], new['p95_ms']):>9}")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("memory", "mongo", "mariadb"), default="memory",
+                        help="storage backend for the local server (default: memory)")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--seed", dest="reseed", action="store_true",
+                        help="with --url: wipe and seed the target (local servers are always seeded)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--promocodes", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="storefront")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before each level")
+    parser.add_argument("--random-seed", dest="seed_value", type=int, default=1)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<backend>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files and exit")
+    args = parser.parse_args(argv)
+    args.levels = [int(level) for level in args.concurrency.split(",")]
+    if args.backend == "memory" and args.workers > 1 and not args.url:
+        parser.error("the memory backend keeps data per process; use --workers 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    rng = random.Random(args.seed_value)
+    started = datetime.now(timezone.utc)
+
+    process = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            backend = "remote"
+        else:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            backend = args.backend
+            process = start_server(args.backend, args.workers, port, Path(tmp))
+        try:
+            wait_until_ready(base_url, process)
+            seeded = process is not None or args.reseed
+            if seeded:
+                print(f"Seeding {args.products} products and {args.orders} orders...")
+                catalog = seed(base_url, args, rng)
+            else:
+                catalog = discover(base_url)
+
+            levels = []
+            for concurrency in args.levels:
+                level = run_level(base_url, catalog, MIXES[args.mix], concurrency,
+                                  args.duration, args.warmup, args.seed_value)
+                print_level(level)
+                levels.append(level)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    results = {
+        "meta": {
+            "timestamp": started.isoformat(),
+            "git_revision": git_revision(),
+            "backend": backend,
+            "url": args.url,
+            "workers": args.workers,
+            "mix": args.mix,
+            "weights": MIXES[args.mix],
+            "volumes": {
+                "categories": len(catalog.categories),
+                "products": len(catalog.products),
+                "promocodes": len(catalog.promocodes),
+                "orders": args.orders if seeded else None,
+            },
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "levels": levels,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%d-%H%M%S}-{backend}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+CPU cost of encoding list responses, per 1000 documents.
+
+Compares the old route path for /products, /orders and /promocodes
+(build ``Model(**doc)`` objects and return them through ``response_model``,
+which FastAPI validates again, runs through jsonable_encoder and encodes
+with the stdlib json module) with DocumentList, which validates once and
+encodes in pydantic-core. No server or database is needed.
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --items 5000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import server  # noqa: E402
+from fast_json import DocumentList  # noqa: E402
+
+
+def product_doc(n: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Мёд {n}",
+        "description": "Натуральный мёд с пасеки. " * 4,
+        "category_id": f"cat-{n % 8}",
+        "image": f"/api/images/{uuid.uuid4().hex}",
+        "base_price": 1200 + n % 500,
+        "weight_prices": [{"weight": f"{w}гр", "price": 1200 + w} for w in (250, 500, 1000)],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def order_doc(n: int) -> dict:
+    items = [
+        {"name": f"Мёд {i}", "weight": "500гр", "price": 1500, "quantity": 1 + i, "product_id": str(uuid.uuid4())}
+        for i in range(3)
+    ]
+    subtotal = sum(item["price"] * item["quantity"] for item in items)
+    return {
+        "id": str(uuid.uuid4()),
+        "customer_name": f"Покупатель {n}",
+        "customer_phone": f"+7900{n:07d}",
+        "items": items,
+        "subtotal": subtotal,
+        "discount": 0,
+        "total": subtotal,
+        "promocode": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def promocode_doc(n: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "code": f"HONEY{n}",
+        "discount_type": "percent",
+        "discount_value": 10,
+        "max_uses": 100,
+        "current_uses": n % 100,
+        "is_active": True,
+    }
+
+
+CASES = {
+    "products": (server.Product, product_doc),
+    "orders": (server.Order, order_doc),
+    "promocodes": (server.Promocode, promocode_doc),
+}
+
+
+async def response_model_path(model, docs) -> bytes:
+    field = create_response_field(name="response", type_=list[model])
+    content = await serialize_response(field=field, response_content=[model(**doc) for doc in docs])
+    return JSONResponse(content).body
+
+
+def document_list_path(documents: DocumentList, docs) -> bytes:
+    return documents.response(docs).body
+
+
+def cpu_time(fn, repeat: int) -> float:
+    """Best CPU time of ``repeat`` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="documents per response")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per path; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<12} {'response_model':>16} {'DocumentList':>14} {'speedup':>8}   (CPU ms per 1000 items)")
+    loop = asyncio.new_event_loop()
+    for name, (model, make_doc) in CASES.items():
+        docs = [make_doc(n) for n in range(args.items)]
+        documents = DocumentList(model)
+        old = loop.run_until_complete(response_model_path(model, docs))
+        new = document_list_path(documents, docs)
+        assert json.loads(old) == json.loads(new), f"{name}: the two paths disagree"
+
+        old_cpu = cpu_time(lambda: loop.run_until_complete(response_model_path(model, docs)), args.repeat)
+        new_cpu = cpu_time(lambda: document_list_path(documents, docs), args.repeat)
+        scale = 1000 / args.items * 1000
+        print(f"{name:<12} {old_cpu * scale:>16.2f} {new_cpu * scale:>14.2f} {old_cpu / new_cpu:>7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""In-process caches for the read-heavy public endpoints.
+
+CatalogCache holds encoded catalog responses, each with the ETag hashed
+from its body; PromocodeCache holds promocode lookups for checkout.
+Each worker process keeps its own caches, so both expire after a short
+TTL: writes made by another worker or straight in the database show up
+within that time even though this worker never saw them.
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class CatalogCache:
+    """Versioned cache for catalog reads (categories, products, about).
+
+    Every admin write that touches the catalog calls ``invalidate()``, which
+    bumps the version and drops all entries. The version is also bumped once
+    it is ``ttl`` seconds old (0 keeps it until the next write), so neither
+    a cached body nor a 304 answered from it outlives a change this worker
+    did not make by more than ``ttl``. A load that started before an
+    invalidation is returned to its caller but not stored, so stale data
+    cannot be written back.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._started = time.monotonic()
+        self._entries: "OrderedDict[tuple, object]" = OrderedDict()
+
+    def current_version(self) -> int:
+        """The catalog version, after moving on from one older than ``ttl``."""
+        if self.ttl and time.monotonic() - self._started >= self.ttl:
+            self.invalidate()
+        return self.version
+
+    async def get_or_load(self, key: tuple, loader):
+        version = self.current_version()
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        value = await loader()
+        if version == self.version:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        self.version += 1
+        self._started = time.monotonic()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttl": self.ttl,
+        }
+
+
+class PromocodeCache:
+    """Short-lived cache of promocodes by normalized code, misses included.
+
+    During a campaign every checkout validates the same code, often once per
+    keystroke; this keeps those lookups off the database. Usage counts may be
+    up to ``ttl`` seconds stale, which is fine for validation because
+    redemption in create_order is checked against the database.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get_or_load(self, key: str, loader):
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = await loader()
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Optional[str] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
@@ -0,0 +1,213 @@
+"""gzip / brotli response compression.
+
+CompressionMiddleware compresses text and JSON responses on the fly,
+buffered or streaming. PrecompressedBody holds a JSON body together with
+its compressed forms so cacheable catalog responses are compressed once
+per cache entry, in a worker thread, instead of on every request;
+responses it builds already carry Content-Encoding and pass through the
+middleware untouched.
+
+Brotli needs the optional ``brotli`` package; without it only gzip is
+offered.
+"""
+import hashlib
+import zlib
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+
+# Per-request compression trades ratio for speed. Cached bodies are
+# compressed again every time their cache entry expires (every
+# CATALOG_CACHE_TTL seconds per URL), so they get only slightly slower
+# settings, not the slowest
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+PRECOMPRESSED_GZIP_LEVEL = 6
+PRECOMPRESSED_BROTLI_QUALITY = 5
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported encoding in an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    compressor = zlib.compressobj(PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental compressor; every chunk is flushed so streams stay live."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if last else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def encoded_etag(headers: MutableHeaders, encoding: str):
+    """Give the compressed representation its own ETag, ``"<tag>-<encoding>"``.
+
+    The bytes differ from the identity response, so they cannot share a
+    strong validator; strip_encoding() maps the tag back for If-None-Match.
+    """
+    etag = headers.get("etag")
+    if etag and etag.endswith('"'):
+        headers["etag"] = f'{etag[:-1]}-{encoding}"'
+
+
+def strip_encoding(etag: str) -> str:
+    """The identity ETag for a tag produced by encoded_etag()."""
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+class PrecompressedBody:
+    """A response body, its strong ETag and its compressed forms, each computed on first use.
+
+    The ETag is a hash of the body, so it is the same in every worker and
+    across restarts for as long as the content is. ``response()`` runs the
+    first compression into each encoding in the threadpool, keeping it off
+    the event loop.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body, encoding, precompressed=True)
+        return data
+
+    async def response(self, accept_encoding: Optional[str], headers: Optional[dict] = None,
+                       minimum_size: int = 0) -> Response:
+        response = Response(self.body, media_type=self.media_type, headers=headers)
+        response.headers.add_vary_header("Accept-Encoding")
+        encoding = negotiate(accept_encoding) if len(self.body) >= minimum_size else None
+        if encoding:
+            response.body = self._encoded.get(encoding) or await run_in_threadpool(self.encoded, encoding)
+            response.headers["content-length"] = str(len(response.body))
+            response.headers["content-encoding"] = encoding
+            encoded_etag(response.headers, encoding)
+        return response
+
+
+class CompressionMiddleware:
+    """Compress compressible responses of at least ``minimum_size`` bytes."""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                encoded_etag(headers, encoding)
+                if more_body:
+                    del headers["content-length"]
+                    compressor = _StreamCompressor(encoding)
+                    body = compressor.chunk(body, last=False)
+                else:
+                    body = compress(body, encoding)
+                    headers["content-length"] = str(len(body))
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            await send({
+                "type": "http.response.body",
+                "body": compressor.chunk(body, last=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
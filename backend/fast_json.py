@@ -0,0 +1,49 @@
+"""JSON encoding for list endpoints.
+
+Returning ``[Model(**doc) for doc in docs]`` through ``response_model``
+validates every document twice (once in the route, once in FastAPI's
+serialize_response), runs it through jsonable_encoder and finally encodes
+it with the stdlib json module. DocumentList validates stored documents
+once and encodes them in pydantic-core, and routes return the bytes in a
+Response, which FastAPI passes through untouched. ``response_model`` stays
+on the route for the OpenAPI schema.
+
+dumps() encodes free-form bodies (partial documents, cached catalog
+bodies) with orjson when it is installed, falling back to json.
+"""
+import json
+from typing import Iterable, List, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """Encode like JSONResponse: compact, UTF-8, non-ASCII left as is."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class DocumentList:
+    """Stored documents validated against ``model`` once and encoded to JSON."""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._adapter = TypeAdapter(List[model])
+
+    def encode(self, docs: Iterable[dict]) -> bytes:
+        return self._adapter.dump_json(self._adapter.validate_python(list(docs)))
+
+    def response(self, docs: Iterable[dict], headers: Optional[dict] = None) -> Response:
+        return Response(self.encode(docs), media_type="application/json", headers=headers)
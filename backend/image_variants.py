@@ -0,0 +1,214 @@
+"""Resized / re-encoded variants of stored images.
+
+Encoding runs in a process pool so Pillow never blocks the event loop, the
+results live in a size-capped on-disk LRU cache, and concurrent requests for
+the same variant share a single encode. Images Pillow cannot decode are
+remembered so they are not re-encoded on every request.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# Widths are snapped to this ladder so the cache cannot be flooded with
+# one-pixel-apart variants of the same image
+WIDTHS = (160, 320, 480, 640, 800, 1200)
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+# Output format used when the caller asks for a width but no format
+SOURCE_FORMATS = {
+    "image/jpeg": "jpeg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "png",
+}
+
+
+# Digests of stored images that failed to decode, remembered per process
+MAX_UNDECODABLE = 1024
+
+
+class UndecodableImage(ValueError):
+    """The stored bytes are not an image Pillow can decode."""
+
+
+def is_decodable(data: bytes) -> bool:
+    """Whether Pillow can open and verify ``data``; True when Pillow is not installed."""
+    try:
+        from PIL import Image
+    except ImportError:  # optional: only the signature check applies
+        return True
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return False
+    return True
+
+
+def snap_width(width: int) -> int:
+    for allowed in WIDTHS:
+        if width <= allowed:
+            return allowed
+    return WIDTHS[-1]
+
+
+def encode_variant(data: bytes, width: int, fmt: str) -> bytes:
+    """Resize ``data`` to at most ``width`` pixels wide and encode it as ``fmt``.
+
+    Runs inside a worker process, so it must stay a picklable module-level
+    function.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format = FORMATS[fmt][0]
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            elif image.mode == "P":
+                image = image.convert("RGBA")
+            out = io.BytesIO()
+            if pil_format == "PNG":
+                image.save(out, pil_format, optimize=True)
+            else:
+                image.save(out, pil_format, quality=80)
+    except (Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        # UnidentifiedImageError and truncated data are OSErrors; some
+        # plugins report corrupt chunks as SyntaxError
+        raise UndecodableImage(str(exc)) from None
+    return out.getvalue()
+
+
+class DiskLRUCache:
+    """A directory of files capped at ``max_bytes``, evicting least recently used.
+
+    Recency is kept in memory and persisted through file mtimes, so the order
+    survives a restart. All methods are blocking and thread-safe.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        files = [p for p in self.root.rglob("*") if p.is_file() and not p.name.startswith(".")]
+        for path in sorted(files, key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.total_bytes -= self._entries.pop(key, 0)
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".variant-")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class VariantService:
+    """Serves image variants from the cache, encoding them on a miss."""
+
+    def __init__(self, store, cache: DiskLRUCache, workers: int = 2):
+        self.store = store
+        self.cache = cache
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._undecodable: "OrderedDict[str, None]" = OrderedDict()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def get(self, digest: str, width: int, fmt: str) -> bytes:
+        """The encoded variant; raises UndecodableImage if the source cannot be decoded."""
+        if digest in self._undecodable:
+            raise UndecodableImage(f"Image {digest} cannot be decoded")
+        key = f"{digest}-{width}.{fmt}"
+        data = await run_in_threadpool(self.cache.get, key)
+        if data is not None:
+            return data
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(key, digest, width, fmt))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one client disconnecting does not cancel everyone's encode
+        return await asyncio.shield(future)
+
+    async def _render(self, key: str, digest: str, width: int, fmt: str) -> bytes:
+        source = await run_in_threadpool(self.store.read, digest)
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(self.executor, encode_variant, source, width, fmt)
+        except UndecodableImage:
+            self._undecodable[digest] = None
+            while len(self._undecodable) > MAX_UNDECODABLE:
+                self._undecodable.popitem(last=False)
+            raise
+        await run_in_threadpool(self.cache.put, key, data)
+        return data
@@ -0,0 +1,228 @@
+"""Prometheus metrics in the text exposition format.
+
+A small thread-safe registry of counters, gauges and histograms, an ASGI
+middleware recording per-route request metrics, and a storage listener
+recording database operations. Route labels use the route template
+(``/api/products/{product_id}``), never the raw path, so label cardinality
+stays bounded.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; tuned for an API whose typical responses take a few milliseconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key, value):
+        counts, total, count = value
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+        yield f"{self.name}_bucket{labels} {count}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def route_template(routes, scope) -> str:
+    """Path template of the route that will handle ``scope``."""
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    # Wrong method on a known path: still attribute it to that path
+    return getattr(partial, "path", UNMATCHED_ROUTE) if partial is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record latency, in-flight requests and status codes per route template.
+
+    ``routes`` is the application's route list; it is read per request, so
+    routers included after the middleware is added are still matched.
+    """
+
+    def __init__(self, app, registry: Registry, routes):
+        self.app = app
+        self.routes = routes
+        self.requests = registry.counter(
+            "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+        )
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+        )
+        self.in_progress = registry.gauge(
+            "http_requests_in_progress", "HTTP requests being served by route", ("method", "route")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = route_template(self.routes, scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_progress.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.latency.observe(time.perf_counter() - started, method=method, route=route)
+            self.requests.inc(method=method, route=route, status=status)
+            self.in_progress.dec(method=method, route=route)
+
+
+class DatabaseMetrics:
+    """Storage listener counting and timing database operations per collection or table."""
+
+    def __init__(self, registry: Registry):
+        self.operations = registry.counter(
+            "db_operations_total", "Database operations by collection or table",
+            ("backend", "operation", "target", "outcome"),
+        )
+        self.latency = registry.histogram(
+            "db_operation_duration_seconds", "Database operation latency by collection or table",
+            ("backend", "operation", "target"), DB_BUCKETS,
+        )
+
+    def __call__(self, operation):
+        labels = {"backend": operation.backend, "operation": operation.name, "target": operation.target}
+        self.latency.observe(operation.duration, **labels)
+        self.operations.inc(outcome="ok" if operation.ok else "error", **labels)
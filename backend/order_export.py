@@ -0,0 +1,110 @@
+"""CSV and NDJSON export of orders, one row per line item.
+
+Rows are encoded as orders arrive from OrderRepository.stream() and sent in
+chunks of about CHUNK_SIZE bytes, so an export of any size is served with
+constant memory. In the CSV, text that a spreadsheet would evaluate as a
+formula is prefixed with ``'``.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta, timezone
+from typing import AsyncIterator, Iterator, Optional
+
+from fast_json import dumps
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+COLUMNS = [
+    "order_id", "created_at", "customer_name", "customer_phone", "promocode",
+    "subtotal", "discount", "total",
+    "product_id", "name", "weight", "price", "quantity", "line_total",
+]
+
+CHUNK_SIZE = 64 * 1024
+
+# Lets Excel detect UTF-8 when it opens the CSV (customer names are Cyrillic)
+CSV_BOM = "\ufeff"
+
+# Spreadsheets treat cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_safe(value):
+    """Quote customer-entered text that a spreadsheet would run as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def parse_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """``from`` / ``to`` query value to an ISO bound comparable with ``created_at``.
+
+    Accepts a date or a datetime; naive values are UTC. A date ``to`` covers
+    the whole day. Raises ValueError for anything else.
+    """
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if len(value) == 10:  # a plain date
+        moment = datetime.combine(moment.date(), time())
+        if end:
+            moment += timedelta(days=1)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def order_rows(order: dict) -> Iterator[dict]:
+    head = {
+        "order_id": order["id"],
+        "created_at": order["created_at"],
+        "customer_name": order["customer_name"],
+        "customer_phone": order["customer_phone"],
+        "promocode": order.get("promocode"),
+        "subtotal": order["subtotal"],
+        "discount": order.get("discount", 0),
+        "total": order["total"],
+    }
+    for item in order.get("items") or [{}]:
+        yield {
+            **head,
+            "product_id": item.get("product_id"),
+            "name": item.get("name"),
+            "weight": item.get("weight"),
+            "price": item.get("price"),
+            "quantity": item.get("quantity"),
+            "line_total": round(item["price"] * item["quantity"], 2) if item else None,
+        }
+
+
+async def csv_chunks(orders: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, COLUMNS)
+    buffer.write(CSV_BOM)
+    writer.writeheader()
+    async for order in orders:
+        writer.writerows({key: csv_safe(value) for key, value in row.items()} for row in order_rows(order))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def ndjson_chunks(orders: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    async for order in orders:
+        for row in order_rows(order):
+            chunk += dumps(row) + b"\n"
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def export_chunks(orders: AsyncIterator[dict], format: str) -> AsyncIterator[bytes]:
+    return csv_chunks(orders) if format == "csv" else ndjson_chunks(orders)
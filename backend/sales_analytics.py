@@ -0,0 +1,109 @@
+"""Sales figures per day, week or month from the daily rollups.
+
+The storage keeps one rollup row per (UTC day, promocode); summarize()
+groups them into buckets with revenue, order count, average basket,
+discount total and promocode usage. Weeks start on Monday. Buckets without
+orders inside the range are included with zeros, so charts have no gaps;
+a requested range of more than MAX_BUCKETS buckets is refused.
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+PERIODS = ("day", "week", "month")
+
+# About two and a half years of days; longer ranges need a longer period
+MAX_BUCKETS = 1000
+
+# Days covered when the caller gives no start
+DEFAULT_DAYS = 90
+
+
+def bucket_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, period: str) -> date:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(first: date, last: date, period: str) -> int:
+    """Number of buckets from the bucket starting at ``first`` to the one at ``last``."""
+    if period == "week":
+        return (last - first).days // 7 + 1
+    if period == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days + 1
+
+
+def default_bounds(start: Optional[date], end: Optional[date], today: date) -> Tuple[date, date]:
+    """``start`` / ``end`` with defaults: ``end`` is today, ``start`` DEFAULT_DAYS days before ``end``."""
+    end = end or today
+    if start is None:
+        start = end - timedelta(days=DEFAULT_DAYS - 1) if end - date.min >= timedelta(days=DEFAULT_DAYS) else date.min
+    return start, end
+
+
+def _empty(start: date) -> dict:
+    return {"start": start.isoformat(), "orders": 0, "revenue": 0.0, "subtotal": 0.0, "discount": 0.0,
+            "promocodes": {}}
+
+
+def _add(bucket: dict, row: dict):
+    bucket["orders"] += row["orders"]
+    bucket["revenue"] += row["revenue"]
+    bucket["subtotal"] += row["subtotal"]
+    bucket["discount"] += row["discount"]
+    if row["promocode"]:
+        usage = bucket["promocodes"].setdefault(row["promocode"], {"orders": 0, "discount": 0.0})
+        usage["orders"] += row["orders"]
+        usage["discount"] += row["discount"]
+
+
+def _finish(bucket: dict) -> dict:
+    for key in ("revenue", "subtotal", "discount"):
+        bucket[key] = round(bucket[key], 2)
+    bucket["average_basket"] = round(bucket["revenue"] / bucket["orders"], 2) if bucket["orders"] else 0.0
+    bucket["promocode_orders"] = sum(usage["orders"] for usage in bucket["promocodes"].values())
+    bucket["promocodes"] = [
+        {"code": code, "orders": usage["orders"], "discount": round(usage["discount"], 2)}
+        for code, usage in sorted(bucket["promocodes"].items(), key=lambda item: -item[1]["orders"])
+    ]
+    return bucket
+
+
+def summarize(rows: List[dict], period: str, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """Buckets covering [start, end], or the days present in ``rows`` when unbounded.
+
+    Raises ValueError when a range with ``start`` or ``end`` given spans more
+    than MAX_BUCKETS buckets; the span of the data itself is not limited.
+    """
+    buckets: Dict[date, dict] = {}
+    total = _empty(start or date.min)
+    for row in rows:
+        key = bucket_start(date.fromisoformat(row["day"]), period)
+        _add(buckets.setdefault(key, _empty(key)), row)
+        _add(total, row)
+    first = bucket_start(start, period) if start else min(buckets, default=None)
+    last = bucket_start(end, period) if end else max(buckets, default=None)
+    series = []
+    if first is not None and last is not None and first <= last:
+        if (start or end) and bucket_count(first, last, period) > MAX_BUCKETS:
+            raise ValueError(f"The range spans more than {MAX_BUCKETS} {period} buckets; use a longer period")
+        key = first
+        while True:
+            series.append(_finish(buckets.get(key) or _empty(key)))
+            # Stop before stepping past the last bucket, which may be the one holding date.max
+            if key >= last:
+                break
+            key = next_bucket(key, period)
+    total = _finish(total)
+    del total["start"]
+    return {"period": period, "buckets": series, "totals": total}
@@ -1,27 +1,66 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
+import time
 import logging
 import secrets
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional
 import uuid
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import base64
+import binascii
+
+from blob_store import LocalBlobStore, sniff_image_type
+from caches import CatalogCache, PromocodeCache
+from compression import CompressionMiddleware, PrecompressedBody, strip_encoding
+from fast_json import DocumentList, FastJSONResponse, dumps as json_body
+from image_variants import DiskLRUCache, UndecodableImage, VariantService, FORMATS, SOURCE_FORMATS, is_decodable, snap_width
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, DatabaseMetrics, MetricsMiddleware, Registry
+from order_export import FORMATS as EXPORT_FORMATS, export_chunks, parse_bound
+from sales_analytics import PERIODS as SALES_PERIODS, default_bounds as default_sales_bounds, summarize as summarize_sales
+from server_timing import ServerTimingMiddleware, TimedRoute, record_db_operation
+from slow_operations import SlowOperationLog
+from storage import BatchWrite, DuplicateError, StorageUnavailable, create_storage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# mongo (default), mariadb or memory; see storage/__init__.py for the settings
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+
+image_store = LocalBlobStore(Path(os.environ.get('IMAGE_STORE_DIR', ROOT_DIR / 'uploads')))
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Product ids read per query by POST /api/images/migrate
+MIGRATION_BATCH_SIZE = 100
 
-app = FastAPI()
-api_router = APIRouter(prefix="/api")
+# Listing endpoints return at most PAGE_SIZE_MAX rows per request; the cursor
+# for the next page is sent in the X-Next-Cursor response header
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# JSON and text responses at least this large are sent gzip/brotli compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+image_variants = VariantService(
+    image_store,
+    DiskLRUCache(
+        Path(os.environ.get('IMAGE_CACHE_DIR', ROOT_DIR / 'image_cache')),
+        int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+    ),
+    workers=int(os.environ.get('IMAGE_WORKERS', 2)),
+)
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.router.route_class = TimedRoute
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
 security = HTTPBasic()
 
 # Health check endpoints for Kubernetes ingress
@@ -29,6 +68,11 @@ security = HTTPBasic()
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus scrape target; request and database metrics, see metrics.py
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"status": "ok", "service": "honey-shop-api"}
@@ -64,6 +108,10 @@ class Product(ProductBase):
     id: str
     created_at: str
 
+PRODUCT_FIELDS = set(Product.model_fields)
+# What the storefront grid needs: no description, image is used as a thumbnail
+CARD_FIELDS = ["id", "name", "category_id", "base_price", "image", "weight_prices"]
+
 class CategoryBase(BaseModel):
     name: str
     slug: str
@@ -72,6 +120,11 @@ class CategoryBase(BaseModel):
 class CategoryCreate(CategoryBase):
     pass
 
+class CategoryUpdate(BaseModel):
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    order: Optional[int] = None
+
 class Category(CategoryBase):
     id: str
 
@@ -94,24 +147,56 @@ class PromocodeCreate(BaseModel):
     discount_value: float
     max_uses: int
 
+class PromocodeUpdate(BaseModel):
+    code: Optional[str] = None
+    discount_type: Optional[str] = None
+    discount_value: Optional[float] = None
+    max_uses: Optional[int] = None
+    is_active: Optional[bool] = None
+
 class Promocode(PromocodeBase):
     id: str
 
+# Admin batch models
+BATCH_MAX_OPERATIONS = 500
+
+class BatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    collection: Literal["products", "categories", "promocodes"]
+    id: Optional[str] = None
+    data: dict = {}
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=BATCH_MAX_OPERATIONS)
+
 # Order models
 class OrderItem(BaseModel):
     name: str
     weight: Optional[str] = None
     price: float
     quantity: int
+    product_id: Optional[str] = None
 
-class OrderCreate(BaseModel):
+class OrderItemCreate(BaseModel):
+    # Items are priced from the catalog; product_id is preferred, name is
+    # accepted for older clients. A client-sent price is ignored.
+    product_id: Optional[str] = None
+    name: Optional[str] = None
+    weight: Optional[str] = None
+    price: Optional[float] = None
+    quantity: int = Field(ge=1)
+
+class OrderQuote(BaseModel):
+    items: List[OrderItemCreate] = Field(min_length=1)
+    promocode: Optional[str] = None
+
+class OrderCreate(OrderQuote):
     customer_name: str
     customer_phone: str
-    items: List[OrderItem]
-    subtotal: float
-    discount: float = 0
-    total: float
-    promocode: Optional[str] = None
+    # Totals are recomputed on the server; these are accepted and ignored
+    subtotal: Optional[float] = None
+    discount: Optional[float] = None
+    total: Optional[float] = None
 
 class Order(BaseModel):
     id: str
@@ -140,6 +225,12 @@ class AboutUs(BaseModel):
     description: str
     features: List[Feature]
 
+# List responses: stored documents are validated once and encoded in pydantic-core
+CATEGORY_LIST = DocumentList(Category)
+ORDER_LIST = DocumentList(Order)
+PRODUCT_LIST = DocumentList(Product)
+PROMOCODE_LIST = DocumentList(Promocode)
+
 # Helper functions
 def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
     correct_username = secrets.compare_digest(credentials.username, ADMIN_USERNAME)
@@ -148,6 +239,123 @@ def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
         raise HTTPException(status_code=401, detail="Incorrect credentials")
     return credentials.username
 
+def image_url(digest: str) -> str:
+    return f"/api/images/{digest}"
+
+def decode_data_url(value: str) -> Optional[bytes]:
+    """Decode a ``data:image/...;base64,`` URL, or return None if it is not one."""
+    if not value.startswith("data:"):
+        return None
+    header, _, payload = value.partition(",")
+    if not header.endswith(";base64"):
+        return None
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+async def store_image(data: bytes) -> str:
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    if not sniff_image_type(data) or not await run_in_threadpool(is_decodable, data):
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+    return await run_in_threadpool(image_store.put, data)
+
+async def externalize_image(image: str) -> str:
+    """Move an inline data-URL image into the blob store and return its URL."""
+    data = decode_data_url(image)
+    if data is None:
+        return image
+    return image_url(await store_image(data))
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"], doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(doc_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        # Every backend compares created_at as a timestamp; reject what is not one
+        datetime.fromisoformat(created_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+def split_page(docs: List[dict], limit: int):
+    """Trim a ``limit + 1`` repository result to the page and its next cursor."""
+    if len(docs) > limit:
+        return docs[:limit], encode_cursor(docs[limit - 1])
+    return docs, None
+
+def parse_product_fields(view: Optional[str], fields: Optional[str]) -> Optional[List[str]]:
+    """Resolve ``view``/``fields`` query params to a field list, None for full products."""
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(requested) - PRODUCT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return requested
+    if view == "card":
+        return CARD_FIELDS
+    if view not in (None, "full"):
+        raise HTTPException(status_code=400, detail="Unknown view")
+    return None
+
+# Catalog responses and their ETags are at most CATALOG_CACHE_TTL seconds stale
+# after a write made outside this worker
+catalog_cache = CatalogCache(ttl=float(os.environ.get('CATALOG_CACHE_TTL', 30)))
+
+def promocode_key(code: str) -> str:
+    """Normalized form of a promocode, stored as ``code_key`` and used for lookups."""
+    return code.strip().upper()
+
+promocode_cache = PromocodeCache(ttl=float(os.environ.get('PROMOCODE_CACHE_TTL', 10)))
+
+storage = create_storage(STORAGE_BACKEND, os.environ, promocode_key)
+
+metrics_registry = Registry()
+storage.add_listener(DatabaseMetrics(metrics_registry))
+storage.add_listener(record_db_operation)
+
+# Database operations at or over SLOW_QUERY_MS are logged; the slowest query
+# shapes are listed at /api/admin/slow-operations
+slow_operations = SlowOperationLog(
+    threshold=float(os.environ.get('SLOW_QUERY_MS', 100)) / 1000,
+    max_shapes=int(os.environ.get('SLOW_QUERY_SHAPES', 500)),
+)
+storage.add_listener(slow_operations)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Compressed responses carry the ETag with an encoding suffix
+    return etag in {strip_encoding(tag.strip().removeprefix("W/")) for tag in header.split(",")}
+
+async def catalog_response(request: Request, response: Response, body: PrecompressedBody) -> Response:
+    """Serve a cached catalog body, or a 304 if the client already has it.
+
+    The ETag is the hash of the body, taken when it was loaded, so while
+    the entry is cached revalidation needs no database call, and the tag
+    survives other workers, restarts and cache expiry as long as the
+    content does not change. The compressed forms live in the catalog
+    cache with the body and are made in the threadpool on first use.
+    ``response`` carries the cursor header set by
+    the route.
+    """
+    headers = {**response.headers, "ETag": body.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, body.etag):
+        return Response(status_code=304, headers=headers)
+    return await body.response(request.headers.get("accept-encoding"), headers, COMPRESSION_MIN_SIZE)
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -161,78 +369,78 @@ async def admin_login(data: AdminLogin):
 
 # Categories
 @api_router.get("/categories", response_model=List[Category])
-async def get_categories():
-    categories = await db.categories.find({}, {"_id": 0}).sort("order", 1).to_list(100)
-    return categories
+async def get_categories(request: Request, response: Response):
+    async def load():
+        categories = await storage.categories.list()
+        return PrecompressedBody(CATEGORY_LIST.encode(categories))
+    return await catalog_response(request, response, await catalog_cache.get_or_load(("categories",), load))
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(category: CategoryCreate, admin: str = Depends(verify_admin)):
     cat_dict = category.model_dump()
     cat_dict["id"] = str(uuid.uuid4())
     # Set order to be last
-    max_order = await db.categories.find_one(sort=[("order", -1)])
-    cat_dict["order"] = (max_order.get("order", 0) + 1) if max_order else 0
-    await db.categories.insert_one(cat_dict)
+    max_order = await storage.categories.max_order()
+    cat_dict["order"] = max_order + 1 if max_order is not None else 0
+    await storage.categories.create(cat_dict)
+    catalog_cache.invalidate()
     return Category(**cat_dict)
 
 @api_router.post("/categories/reorder")
 async def reorder_categories(category_ids: List[str], admin: str = Depends(verify_admin)):
-    for index, cat_id in enumerate(category_ids):
-        await db.categories.update_one({"id": cat_id}, {"$set": {"order": index}})
+    await storage.categories.reorder(category_ids)
+    catalog_cache.invalidate()
     return {"success": True}
 
 @api_router.put("/categories/{category_id}", response_model=Category)
 async def update_category(category_id: str, category: CategoryCreate, admin: str = Depends(verify_admin)):
-    result = await db.categories.update_one(
-        {"id": category_id},
-        {"$set": category.model_dump()}
-    )
-    if result.matched_count == 0:
+    updated = await storage.categories.update(category_id, category.model_dump())
+    catalog_cache.invalidate()
+    if updated is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    updated = await db.categories.find_one({"id": category_id}, {"_id": 0})
     return Category(**updated)
 
 @api_router.delete("/categories/{category_id}")
 async def delete_category(category_id: str, admin: str = Depends(verify_admin)):
-    result = await db.categories.delete_one({"id": category_id})
-    if result.deleted_count == 0:
+    deleted = await storage.categories.delete(category_id)
+    catalog_cache.invalidate()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"success": True}
 
 # Promocodes
 @api_router.get("/promocodes", response_model=List[Promocode])
 async def get_promocodes(admin: str = Depends(verify_admin)):
-    promocodes = await db.promocodes.find({}, {"_id": 0}).to_list(100)
-    return [Promocode(**p) for p in promocodes]
+    return PROMOCODE_LIST.response(await storage.promocodes.list())
 
 @api_router.post("/promocodes", response_model=Promocode)
 async def create_promocode(promo: PromocodeCreate, admin: str = Depends(verify_admin)):
     promo_dict = promo.model_dump()
     promo_dict["id"] = str(uuid.uuid4())
+    promo_dict["code_key"] = promocode_key(promo.code)
     promo_dict["current_uses"] = 0
     promo_dict["is_active"] = True
-    await db.promocodes.insert_one(promo_dict)
+    try:
+        await storage.promocodes.create(promo_dict)
+    except DuplicateError:
+        raise HTTPException(status_code=409, detail="Промокод уже существует")
+    promocode_cache.invalidate(promo_dict["code_key"])
     return Promocode(**promo_dict)
 
 @api_router.delete("/promocodes/{promo_id}")
 async def delete_promocode(promo_id: str, admin: str = Depends(verify_admin)):
-    result = await db.promocodes.delete_one({"id": promo_id})
-    if result.deleted_count == 0:
+    deleted = await storage.promocodes.delete(promo_id)
+    promocode_cache.invalidate()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Promocode not found")
     return {"success": True}
 
 @api_router.post("/promocodes/validate")
 async def validate_promocode(data: dict):
-    code = data.get("code", "").strip().upper()
+    key = promocode_key(data.get("code", ""))
     subtotal = data.get("subtotal", 0)
     
-    promo = await db.promocodes.find_one({"code": code.upper()}, {"_id": 0})
-    if not promo:
-        # Try lowercase
-        promo = await db.promocodes.find_one({"code": code.lower()}, {"_id": 0})
-    if not promo:
-        # Try original case
-        promo = await db.promocodes.find_one({"code": data.get("code", "").strip()}, {"_id": 0})
+    promo = await promocode_cache.get_or_load(key, lambda: storage.promocodes.get_by_key(key))
     
     if not promo:
         raise HTTPException(status_code=404, detail="Промокод не найден")
@@ -243,105 +451,335 @@ async def validate_promocode(data: dict):
     if promo.get("current_uses", 0) >= promo.get("max_uses", 0):
         raise HTTPException(status_code=400, detail="Промокод исчерпан")
     
-    discount = 0
-    if promo["discount_type"] == "percent":
-        discount = subtotal * promo["discount_value"] / 100
-    else:
-        discount = min(promo["discount_value"], subtotal)
-    
     return {
         "valid": True,
         "code": promo["code"],
         "discount_type": promo["discount_type"],
         "discount_value": promo["discount_value"],
-        "discount": round(discount, 2)
+        "discount": compute_discount(promo, subtotal)
     }
 
+def compute_discount(promo: dict, subtotal: float) -> float:
+    if promo["discount_type"] == "percent":
+        discount = subtotal * promo["discount_value"] / 100
+    else:
+        discount = min(promo["discount_value"], subtotal)
+    return round(discount, 2)
+
+def unit_price(product: dict, weight: Optional[str]) -> float:
+    if weight:
+        for wp in product.get("weight_prices") or []:
+            if wp["weight"] == weight:
+                return wp["price"]
+        raise HTTPException(status_code=400, detail=f"Граммовка {weight} недоступна для товара {product['name']}")
+    return product["base_price"]
+
+async def price_order_items(items: List[OrderItemCreate]) -> List[dict]:
+    """Price order lines from the catalog with a single batched query."""
+    ids = {item.product_id for item in items if item.product_id}
+    names = {item.name for item in items if not item.product_id and item.name}
+    products = await storage.products.find_for_pricing(sorted(ids), sorted(names))
+    by_id = {p["id"]: p for p in products}
+    by_name = {p["name"]: p for p in products}
+    lines = []
+    for item in items:
+        product = by_id.get(item.product_id) if item.product_id else by_name.get(item.name)
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Товар не найден: {item.product_id or item.name}")
+        lines.append({
+            "product_id": product["id"],
+            "name": product["name"],
+            "weight": item.weight,
+            "price": unit_price(product, item.weight),
+            "quantity": item.quantity,
+        })
+    return lines
+
+def order_subtotal(lines: List[dict]) -> float:
+    return round(sum(line["price"] * line["quantity"] for line in lines), 2)
+
+async def redeem_promocode(code: str) -> dict:
+    """Atomically take one use of a promocode, or raise if it cannot be used.
+
+    The usage check and the increment are a single conditional update, so
+    parallel checkouts can never push current_uses past max_uses.
+    """
+    key = promocode_key(code)
+    promo = await storage.promocodes.redeem(key)
+    promocode_cache.invalidate(key)
+    if promo is not None:
+        return promo
+    # Only reached on failure: find out why for the error message
+    existing = await storage.promocodes.get_by_key(key)
+    if not existing:
+        raise HTTPException(status_code=404, detail="Промокод не найден")
+    if not existing.get("is_active", True):
+        raise HTTPException(status_code=400, detail="Промокод неактивен")
+    raise HTTPException(status_code=400, detail="Промокод исчерпан")
+
+async def release_promocode(code: str):
+    """Give back a use taken by redeem_promocode when the order could not be saved."""
+    key = promocode_key(code)
+    await storage.promocodes.release(key)
+    promocode_cache.invalidate(key)
+
 # Orders
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(admin: str = Depends(verify_admin)):
-    orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [Order(**o) for o in orders]
+async def get_orders(
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    admin: str = Depends(verify_admin),
+):
+    after = decode_cursor(cursor) if cursor else None
+    orders, next_cursor = split_page(await storage.orders.list_page(limit, after), limit)
+    return ORDER_LIST.response(orders, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+@api_router.get("/orders/export")
+async def export_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    admin: str = Depends(verify_admin),
+):
+    """Orders created in [from, to], one row per line item, streamed from the database."""
+    try:
+        bounds = parse_bound(start), parse_bound(end, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be ISO dates or datetimes")
+    filename = "-".join(["orders", *(value[:10] for value in (start, end) if value)]) + f".{format}"
+    return StreamingResponse(
+        export_chunks(storage.orders.stream(*bounds), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@api_router.post("/orders/quote")
+async def quote_order(quote: OrderQuote):
+    """Price a cart without placing the order."""
+    lines = await price_order_items(quote.items)
+    subtotal = order_subtotal(lines)
+    discount, promocode = 0, None
+    if quote.promocode:
+        key = promocode_key(quote.promocode)
+        promo = await promocode_cache.get_or_load(key, lambda: storage.promocodes.get_by_key(key))
+        if promo and promo.get("is_active", True) and promo.get("current_uses", 0) < promo.get("max_uses", 0):
+            discount, promocode = compute_discount(promo, subtotal), promo["code"]
+    return {
+        "items": lines,
+        "subtotal": subtotal,
+        "discount": discount,
+        "total": round(subtotal - discount, 2),
+        "promocode": promocode,
+    }
 
 @api_router.post("/orders", response_model=Order)
 async def create_order(order: OrderCreate):
-    order_dict = order.model_dump()
-    order_dict["id"] = str(uuid.uuid4())
-    order_dict["created_at"] = datetime.now(timezone.utc).isoformat()
+    # Price from the catalog before touching the promocode, so an invalid
+    # cart does not use it up
+    lines = await price_order_items(order.items)
+    subtotal = order_subtotal(lines)
+    order_dict = {
+        "id": str(uuid.uuid4()),
+        "customer_name": order.customer_name,
+        "customer_phone": order.customer_phone,
+        "items": lines,
+        "subtotal": subtotal,
+        "discount": 0,
+        "total": subtotal,
+        "promocode": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
     
-    # Update promocode usage if used
+    # Redeem the promocode first; the order is rejected if it is exhausted
     if order.promocode:
-        await db.promocodes.update_one(
-            {"code": order.promocode},
-            {"$inc": {"current_uses": 1}}
-        )
+        promo = await redeem_promocode(order.promocode)
+        order_dict["promocode"] = promo["code"]
+        order_dict["discount"] = compute_discount(promo, subtotal)
+        order_dict["total"] = round(subtotal - order_dict["discount"], 2)
     
-    await db.orders.insert_one(order_dict)
+    try:
+        await storage.orders.create(order_dict)
+    except Exception:
+        if order.promocode:
+            await release_promocode(order.promocode)
+        raise
     return Order(**order_dict)
 
 @api_router.delete("/orders/{order_id}")
 async def delete_order(order_id: str, admin: str = Depends(verify_admin)):
-    result = await db.orders.delete_one({"id": order_id})
-    if result.deleted_count == 0:
+    if not await storage.orders.delete(order_id):
         raise HTTPException(status_code=404, detail="Order not found")
     return {"success": True}
 
+# Analytics
+@api_router.get("/analytics/sales")
+async def sales_analytics(
+    period: Literal[SALES_PERIODS] = "day",
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    admin: str = Depends(verify_admin),
+):
+    """Revenue, orders, average basket, discounts and promocode usage per period.
+
+    Read from the daily rollups kept by create_order / delete_order; days are UTC.
+    Without ``from`` the last 90 days up to ``to`` (default today) are summarized.
+    """
+    try:
+        bounds = [date.fromisoformat(value) if value else None for value in (start, end)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be ISO dates")
+    bounds = default_sales_bounds(*bounds, datetime.now(timezone.utc).date())
+    rows = await storage.rollups.list(*(value.isoformat() if value else None for value in bounds))
+    try:
+        return summarize_sales(rows, period, *bounds)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_rollups(admin: str = Depends(verify_admin)):
+    """Recompute the daily sales rollups from the orders."""
+    started = time.perf_counter()
+    rows = await storage.rollups.rebuild()
+    return {"rows": rows, "seconds": round(time.perf_counter() - started, 3)}
+
 # About Us
+DEFAULT_ABOUT = {
+    "id": "about-us",
+    "title": "О нас",
+    "description": "Ферма Медовик — это семейная пасека, расположенная в экологически чистом районе. Мы занимаемся пчеловодством более 15 лет и гордимся качеством нашей продукции. Каждый наш продукт — это результат любви к природе и заботы о здоровье наших покупателей.",
+    "features": [
+        {"text": "100% натуральная продукция", "icon": "FaCheckCircle"},
+        {"text": "Экологически чистый район", "icon": "FaLeaf"},
+        {"text": "Более 15 лет опыта", "icon": "FaStar"},
+        {"text": "Доставка по всему Казахстану", "icon": "FaTruck"}
+    ]
+}
+
 @api_router.get("/about")
-async def get_about():
-    about = await db.about.find_one({"id": "about-us"}, {"_id": 0})
-    if not about:
-        # Default content
-        default_about = {
-            "id": "about-us",
-            "title": "О нас",
-            "description": "Ферма Медовик — это семейная пасека, расположенная в экологически чистом районе. Мы занимаемся пчеловодством более 15 лет и гордимся качеством нашей продукции. Каждый наш продукт — это результат любви к природе и заботы о здоровье наших покупателей.",
-            "features": [
-                {"text": "100% натуральная продукция", "icon": "FaCheckCircle"},
-                {"text": "Экологически чистый район", "icon": "FaLeaf"},
-                {"text": "Более 15 лет опыта", "icon": "FaStar"},
-                {"text": "Доставка по всему Казахстану", "icon": "FaTruck"}
-            ]
-        }
-        await db.about.insert_one(default_about)
-        return default_about
-    return about
+async def get_about(request: Request, response: Response):
+    async def load():
+        # Default content until an admin saves their own; PUT /about upserts it
+        return PrecompressedBody(json_body(await storage.about.get() or DEFAULT_ABOUT))
+    return await catalog_response(request, response, await catalog_cache.get_or_load(("about",), load))
 
 @api_router.put("/about")
 async def update_about(data: AboutUsUpdate, admin: str = Depends(verify_admin)):
     update_data = data.model_dump()
     update_data["id"] = "about-us"
-    await db.about.update_one(
-        {"id": "about-us"},
-        {"$set": update_data},
-        upsert=True
-    )
+    await storage.about.save(update_data)
+    catalog_cache.invalidate()
     return {"success": True, "message": "About Us updated"}
 
+# Images
+@api_router.post("/images")
+async def upload_image(file: UploadFile = File(...), admin: str = Depends(verify_admin)):
+    data = await file.read(MAX_IMAGE_BYTES + 1)
+    digest = await store_image(data)
+    return {"hash": digest, "url": image_url(digest), "size": len(data)}
+
+@api_router.get("/images/{digest}")
+async def get_image(digest: str, request: Request, w: Optional[int] = None, format: Optional[str] = None):
+    if not image_store.exists(digest):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+    if w is not None and w <= 0:
+        raise HTTPException(status_code=400, detail="Width must be positive")
+    content_type = await run_in_threadpool(image_store.content_type, digest)
+    if w is None and format is None:
+        etag = f'"{digest}"'
+    else:
+        width = snap_width(w) if w is not None else snap_width(10 ** 6)
+        fmt = format or SOURCE_FORMATS.get(content_type, "png")
+        etag = f'"{digest}-{width}.{fmt}"'
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if w is None and format is None:
+        return FileResponse(image_store.path_for(digest), media_type=content_type, headers=headers)
+    try:
+        data = await image_variants.get(digest, width, fmt)
+    except UndecodableImage:
+        raise HTTPException(status_code=422, detail="Image cannot be decoded")
+    return Response(content=data, media_type=FORMATS[fmt][1], headers=headers)
+
+@api_router.post("/images/migrate")
+async def migrate_inline_images(admin: str = Depends(verify_admin)):
+    """One-off migration: move data-URL images out of product documents.
+
+    Ids are read in batches and each product is fetched and rewritten on
+    its own, so only one inline image is held in memory at a time.
+    """
+    migrated, skipped = 0, []
+    after = None
+    while True:
+        ids = await storage.products.find_inline_image_ids(after, MIGRATION_BATCH_SIZE)
+        if not ids:
+            break
+        after = ids[-1]
+        for product_id in ids:
+            product = await storage.products.get(product_id)
+            image = (product or {}).get("image") or ""
+            if not image.startswith("data:"):
+                # Deleted or changed since the ids were read
+                continue
+            data = decode_data_url(image)
+            if data is None or not sniff_image_type(data) or not await run_in_threadpool(is_decodable, data):
+                skipped.append(product_id)
+                continue
+            digest = await run_in_threadpool(image_store.put, data)
+            await storage.products.update(product_id, {"image": image_url(digest)})
+            migrated += 1
+    if migrated:
+        catalog_cache.invalidate()
+    return {"migrated": migrated, "skipped": skipped}
+
 # Products
 @api_router.get("/products", response_model=List[Product])
-async def get_products(category_id: Optional[str] = None):
-    query = {}
-    if category_id:
-        query["category_id"] = category_id
-    products = await db.products.find(query, {"_id": 0}).to_list(1000)
-    return [Product(**p) for p in products]
+async def get_products(
+    request: Request,
+    response: Response,
+    category_id: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    view: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    selected = parse_product_fields(view, fields)
+    after = decode_cursor(cursor) if cursor else None
+    async def load():
+        docs = await storage.products.list_page(category_id, limit, after, selected)
+        products, next_cursor = split_page(docs, limit)
+        # Partial documents go out straight from the projection, skipping Product validation
+        body = json_body(products) if selected else PRODUCT_LIST.encode(products)
+        return PrecompressedBody(body), next_cursor
+    body, next_cursor = await catalog_cache.get_or_load(
+        ("products", category_id, limit, cursor, tuple(selected or ())), load
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return await catalog_response(request, response, body)
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
+async def get_product(product_id: str, request: Request, response: Response):
+    async def load():
+        product = await storage.products.get(product_id)
+        return PrecompressedBody(json_body(Product(**product).model_dump(mode="json"))) if product else None
+    body = await catalog_cache.get_or_load(("product", product_id), load)
+    if body is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**product)
+    return await catalog_response(request, response, body)
 
 @api_router.post("/products", response_model=Product)
 async def create_product(product: ProductCreate, admin: str = Depends(verify_admin)):
     prod_dict = product.model_dump()
     prod_dict["id"] = str(uuid.uuid4())
     prod_dict["created_at"] = datetime.now(timezone.utc).isoformat()
+    prod_dict["image"] = await externalize_image(prod_dict["image"])
     weight_prices = prod_dict.get("weight_prices", [])
     prod_dict["weight_prices"] = [wp if isinstance(wp, dict) else wp.model_dump() for wp in weight_prices]
-    await db.products.insert_one(prod_dict)
+    await storage.products.create(prod_dict)
+    catalog_cache.invalidate()
     return Product(**prod_dict)
 
 @api_router.put("/products/{product_id}", response_model=Product)
@@ -349,25 +787,143 @@ async def update_product(product_id: str, product: ProductUpdate, admin: str = D
     update_data = {k: v for k, v in product.model_dump().items() if v is not None}
     if "weight_prices" in update_data:
         update_data["weight_prices"] = [wp if isinstance(wp, dict) else wp.model_dump() for wp in update_data["weight_prices"]]
+    if "image" in update_data:
+        update_data["image"] = await externalize_image(update_data["image"])
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
-    result = await db.products.update_one({"id": product_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    updated = await storage.products.update(product_id, update_data)
+    catalog_cache.invalidate()
+    if updated is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    updated = await db.products.find_one({"id": product_id}, {"_id": 0})
     return Product(**updated)
 
 @api_router.delete("/products/{product_id}")
 async def delete_product(product_id: str, admin: str = Depends(verify_admin)):
-    result = await db.products.delete_one({"id": product_id})
-    if result.deleted_count == 0:
+    deleted = await storage.products.delete(product_id)
+    catalog_cache.invalidate()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
     return {"success": True}
 
+# Admin batch writes
+BATCH_MODELS = {
+    "products": (ProductCreate, ProductUpdate),
+    "categories": (CategoryCreate, CategoryUpdate),
+    "promocodes": (PromocodeCreate, PromocodeUpdate),
+}
+
+async def prepare_batch_write(op: BatchOperation, next_category_order) -> BatchWrite:
+    """Validate one batch operation and build the write the storage applies."""
+    create_model, update_model = BATCH_MODELS[op.collection]
+    if op.op == "create":
+        doc = create_model(**op.data).model_dump()
+        doc["id"] = str(uuid.uuid4())
+        if op.collection == "products":
+            doc["created_at"] = datetime.now(timezone.utc).isoformat()
+            doc["image"] = await externalize_image(doc["image"])
+        elif op.collection == "categories":
+            doc["order"] = await next_category_order()
+        else:
+            doc["code_key"] = promocode_key(doc["code"])
+            doc["current_uses"] = 0
+            doc["is_active"] = True
+        return BatchWrite(op.collection, "create", doc["id"], doc)
+
+    if not op.id:
+        raise ValueError("id is required")
+    if op.op == "delete":
+        return BatchWrite(op.collection, "delete", op.id)
+    update = update_model(**op.data).model_dump(exclude_none=True)
+    if not update:
+        raise ValueError("No data to update")
+    if "image" in update:
+        update["image"] = await externalize_image(update["image"])
+    if op.collection == "promocodes" and "code" in update:
+        update["code_key"] = promocode_key(update["code"])
+    return BatchWrite(op.collection, "update", op.id, update)
+
+@api_router.post("/admin/batch")
+async def admin_batch(batch: BatchRequest, admin: str = Depends(verify_admin)):
+    """Apply create/update/delete operations across catalog collections.
+
+    Processing stops at the first failed write and later operations are
+    reported as skipped. On MongoDB earlier operations stay applied; MariaDB
+    runs the batch in one transaction, so a failure skips everything.
+    """
+    operations = batch.operations
+    max_order = None
+
+    async def next_category_order():
+        nonlocal max_order
+        if max_order is None:
+            last = await storage.categories.max_order()
+            max_order = last if last is not None else -1
+        max_order += 1
+        return max_order
+
+    writes, errors = [], []
+    for index, op in enumerate(operations):
+        try:
+            writes.append(await prepare_batch_write(op, next_category_order))
+        except HTTPException as e:
+            errors.append({"index": index, "error": e.detail})
+        except ValidationError as e:
+            errors.append({"index": index, "error": e.errors(include_url=False, include_context=False)})
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    # One lookup per collection tells updates and deletes of missing documents apart
+    existing = {}
+    for collection in {op.collection for op in operations}:
+        ids = [op.id for op in operations if op.collection == collection and op.op != "create"]
+        existing[collection] = await storage.repository(collection).existing_ids(ids) if ids else set()
+
+    results = []
+    for op, write in zip(operations, writes):
+        doc_id = write.id
+        ids = existing[op.collection]
+        if op.op == "create":
+            ids.add(doc_id)
+            status = "created"
+        elif doc_id not in ids:
+            status = "not_found"
+        elif op.op == "delete":
+            ids.discard(doc_id)
+            status = "deleted"
+        else:
+            status = "updated"
+        results.append({"index": len(results), "collection": op.collection, "id": doc_id, "status": status})
+
+    success = True
+    try:
+        failure = await storage.apply_batch(writes)
+        if failure is not None:
+            success = False
+            if failure.rolled_back:
+                for result in results:
+                    result["status"] = "skipped"
+            for failed in failure.indexes:
+                if failure.duplicate:
+                    message = "Промокод уже существует" if operations[failed].collection == "promocodes" else "Duplicate key"
+                else:
+                    message = failure.message
+                results[failed].update(status="error", error=message)
+            for result in results[max(failure.indexes) + 1:]:
+                result["status"] = "skipped"
+    finally:
+        collections = {op.collection for op in operations}
+        if collections & {"products", "categories"}:
+            catalog_cache.invalidate()
+        if "promocodes" in collections:
+            promocode_cache.invalidate()
+    return {"success": success, "results": results}
+
 # Seed data
 @api_router.post("/seed")
 async def seed_data():
-    existing_categories = await db.categories.count_documents({})
+    existing_categories = await storage.categories.count()
     if existing_categories > 0:
         return {"message": "Data already seeded"}
     
@@ -379,7 +935,7 @@ async def seed_data():
         {"id": "cat-candle", "name": "Свечи", "slug": "candles"},
         {"id": "cat-accessory", "name": "Аксессуары", "slug": "accessories"},
     ]
-    await db.categories.insert_many(categories)
+    await storage.categories.insert_many(categories)
     
     honey_weights = [
         {"weight": "250гр", "price": 1201},
@@ -425,14 +981,15 @@ async def seed_data():
         {"id": str(uuid.uuid4()), "name": "Подарочный набор", "description": "Красивая подарочная упаковка для мёда и пчелопродуктов.", "category_id": "cat-accessory", "image": "https://images.unsplash.com/photo-1722718465036-64e3eacef09b?w=800", "base_price": 1000, "weight_prices": [], "created_at": datetime.now(timezone.utc).isoformat()},
     ]
     
-    await db.products.insert_many(products)
+    await storage.products.insert_many(products)
+    catalog_cache.invalidate()
     return {"message": "Data seeded successfully", "categories": len(categories), "products": len(products)}
 
 # Fix duplicate categories
 @api_router.post("/fix-categories")
 async def fix_categories():
     # Delete all categories
-    await db.categories.delete_many({})
+    await storage.categories.delete_all()
     
     # Insert unique categories
     categories = [
@@ -443,51 +1000,87 @@ async def fix_categories():
         {"id": "cat-candle", "name": "Свечи", "slug": "candles"},
         {"id": "cat-accessory", "name": "Аксессуары", "slug": "accessories"},
     ]
-    await db.categories.insert_many(categories)
+    await storage.categories.insert_many(categories)
+    catalog_cache.invalidate()
     
     return {"message": "Categories fixed", "count": len(categories)}
 
+# Index report
+@api_router.get("/admin/indexes")
+async def get_index_report(admin: str = Depends(verify_admin)):
+    return await storage.index_report()
+
+# Cache statistics
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(admin: str = Depends(verify_admin)):
+    return {"storage": storage.name, "catalog": catalog_cache.stats(), "promocodes": promocode_cache.stats()}
+
+# Slowest database query shapes
+@api_router.get("/admin/slow-operations")
+async def get_slow_operations(
+    limit: int = Query(20, ge=1, le=500),
+    order: Literal["max", "total", "mean", "count"] = "max",
+    admin: str = Depends(verify_admin),
+):
+    return {
+        "storage": storage.name,
+        "threshold_ms": slow_operations.threshold * 1000,
+        "slow_count": slow_operations.slow_count,
+        "operations": slow_operations.top(limit, order),
+    }
+
+@api_router.delete("/admin/slow-operations")
+async def reset_slow_operations(admin: str = Depends(verify_admin)):
+    slow_operations.reset()
+    return {"success": True}
+
 # Selective data deletion
 @api_router.delete("/data/orders")
 async def delete_all_orders(admin: str = Depends(verify_admin)):
-    result = await db.orders.delete_many({})
-    return {"message": "All orders deleted", "deleted_count": result.deleted_count}
+    deleted = await storage.orders.delete_all()
+    return {"message": "All orders deleted", "deleted_count": deleted}
 
 @api_router.delete("/data/products")
 async def delete_all_products(admin: str = Depends(verify_admin)):
-    result = await db.products.delete_many({})
-    return {"message": "All products deleted", "deleted_count": result.deleted_count}
+    deleted = await storage.products.delete_all()
+    catalog_cache.invalidate()
+    return {"message": "All products deleted", "deleted_count": deleted}
 
 @api_router.delete("/data/categories")
 async def delete_all_categories(admin: str = Depends(verify_admin)):
-    result = await db.categories.delete_many({})
-    return {"message": "All categories deleted", "deleted_count": result.deleted_count}
+    deleted = await storage.categories.delete_all()
+    catalog_cache.invalidate()
+    return {"message": "All categories deleted", "deleted_count": deleted}
 
 @api_router.delete("/data/promocodes")
 async def delete_all_promocodes(admin: str = Depends(verify_admin)):
-    result = await db.promocodes.delete_many({})
-    return {"message": "All promocodes deleted", "deleted_count": result.deleted_count}
+    deleted = await storage.promocodes.delete_all()
+    promocode_cache.invalidate()
+    return {"message": "All promocodes deleted", "deleted_count": deleted}
 
 @api_router.delete("/data/about")
 async def delete_about(admin: str = Depends(verify_admin)):
-    result = await db.about.delete_many({})
-    return {"message": "About data deleted", "deleted_count": result.deleted_count}
+    deleted = await storage.about.delete_all()
+    catalog_cache.invalidate()
+    return {"message": "About data deleted", "deleted_count": deleted}
 
 @api_router.delete("/data/all")
 async def delete_all_data(admin: str = Depends(verify_admin)):
-    orders = await db.orders.delete_many({})
-    products = await db.products.delete_many({})
-    categories = await db.categories.delete_many({})
-    promocodes = await db.promocodes.delete_many({})
-    about = await db.about.delete_many({})
+    orders = await storage.orders.delete_all()
+    products = await storage.products.delete_all()
+    categories = await storage.categories.delete_all()
+    promocodes = await storage.promocodes.delete_all()
+    about = await storage.about.delete_all()
+    catalog_cache.invalidate()
+    promocode_cache.invalidate()
     return {
         "message": "All data deleted",
         "deleted": {
-            "orders": orders.deleted_count,
-            "products": products.deleted_count,
-            "categories": categories.deleted_count,
-            "promocodes": promocodes.deleted_count,
-            "about": about.deleted_count
+            "orders": orders,
+            "products": products,
+            "categories": categories,
+            "promocodes": promocodes,
+            "about": about
         }
     }
 
@@ -499,11 +1092,26 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+app.add_middleware(MetricsMiddleware, registry=metrics_registry, routes=app.routes)
+# Per-request phase breakdown; SERVER_TIMING=0 turns the header off
+if os.environ.get('SERVER_TIMING', '1') != '0':
+    app.add_middleware(ServerTimingMiddleware, log=os.environ.get('SERVER_TIMING_LOG') == '1')
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@app.exception_handler(StorageUnavailable)
+async def storage_unavailable(request: Request, exc: StorageUnavailable):
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, try again"})
+
+@app.on_event("startup")
+async def prepare_storage():
+    await storage.prepare()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await storage.close()
+    image_variants.shutdown()
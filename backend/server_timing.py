@@ -0,0 +1,161 @@
+"""Server-Timing response header with a per-request phase breakdown.
+
+Each request gets a RequestTiming in a context variable. Storage listeners
+add database round trips to it from whichever thread the driver runs on
+(Motor and the MariaDB backend both copy the context into their threads),
+and TimedRoute marks when the endpoint starts and returns. The header then
+splits the request into:
+
+    validate   request parsing, dependencies and body validation
+    db         database round trips (their count is in ``desc``)
+    app        endpoint time outside the database
+    serialize  response model validation and JSON encoding
+    total      from the middleware to the first response byte
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+current_timing: ContextVar[Optional["RequestTiming"]] = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        self.db_time = 0.0
+        self.db_count = 0
+        self._lock = threading.Lock()
+
+    def add_db(self, duration: float):
+        with self._lock:
+            self.db_time += duration
+            self.db_count += 1
+
+    def phases(self, now: float) -> dict:
+        """Phase durations in milliseconds; phases that did not run are left out."""
+        phases = {}
+        if self.endpoint_started is None:
+            # Rejected before the endpoint ran, e.g. a 422 or 401
+            phases["validate"] = now - self.started
+        else:
+            finished = self.endpoint_finished or now
+            phases["validate"] = self.endpoint_started - self.started
+            phases["app"] = max(finished - self.endpoint_started - self.db_time, 0.0)
+            phases["serialize"] = now - finished
+        phases["db"] = self.db_time
+        phases["total"] = now - self.started
+        return {name: round(value * 1000, 3) for name, value in phases.items()}
+
+    def header(self, phases: dict) -> str:
+        entries = []
+        for name in ("validate", "db", "app", "serialize", "total"):
+            if name not in phases:
+                continue
+            entry = f"{name};dur={phases[name]}"
+            if name == "db":
+                entry += f';desc="round trips: {self.db_count}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+def record_db_operation(operation):
+    """Storage listener adding each round trip to the current request."""
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add_db(operation.duration)
+
+
+def _timed_endpoint(call):
+    def mark_start():
+        timing = current_timing.get()
+        if timing is not None:
+            timing.endpoint_started = time.perf_counter()
+        return timing
+
+    def mark_finish(timing):
+        if timing is not None:
+            timing.endpoint_finished = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            timing = mark_start()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                mark_finish(timing)
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            timing = mark_start()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                mark_finish(timing)
+    return endpoint
+
+
+class TimedRoute(APIRoute):
+    """APIRoute whose endpoint marks the start and end of the app phase.
+
+    Only the call is wrapped; FastAPI has already read the endpoint's
+    signature, so parameters and validation are unchanged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+
+
+class ServerTimingMiddleware:
+    """Attach the Server-Timing header and optionally log the phases."""
+
+    def __init__(self, app, log: bool = False):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        status = None
+        phases = None
+
+        async def send_wrapper(message):
+            nonlocal status, phases
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                phases = timing.phases(time.perf_counter())
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header(phases).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timing.reset(token)
+            if self.log and phases is not None:
+                logger.info(
+                    "%s %s %s %.1fms db=%d",
+                    scope["method"], scope["path"], status, phases["total"], timing.db_count,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "db_count": timing.db_count,
+                        **{f"{name}_ms": value for name, value in phases.items()},
+                    },
+                )
@@ -0,0 +1,80 @@
+"""Slow-operation log and a table of the slowest query shapes.
+
+Registered as a storage listener, SlowOperationLog sees every database
+round trip. Operations at or over the threshold are logged with their
+collection or table, redacted shape and duration. Every operation is also
+folded into per-shape statistics, kept for at most ``max_shapes`` shapes,
+from which the admin endpoint reads the slowest ones.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+ORDERINGS = ("max", "total", "mean", "count")
+
+
+class SlowOperationLog:
+    def __init__(self, threshold: float = 0.1, max_shapes: int = 500):
+        self.threshold = threshold
+        self.max_shapes = max_shapes
+        self._shapes: Dict[Tuple[str, str, str, str], dict] = {}
+        self._lock = threading.Lock()
+        self.slow_count = 0
+
+    def __call__(self, operation):
+        shape = operation.shape()
+        slow = operation.duration >= self.threshold
+        if slow:
+            logger.warning(
+                "Slow %s %s on %s: %.1f ms %s",
+                operation.backend, operation.name, operation.target or "-",
+                operation.duration * 1000, shape,
+            )
+        key = (operation.backend, operation.name, operation.target, shape)
+        with self._lock:
+            if slow:
+                self.slow_count += 1
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # Make room by forgetting the shape least likely to matter
+                    del self._shapes[min(self._shapes, key=lambda k: self._shapes[k]["max"])]
+                stats = self._shapes[key] = {"count": 0, "slow": 0, "errors": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += operation.duration
+            stats["max"] = max(stats["max"], operation.duration)
+            stats["slow"] += slow
+            stats["errors"] += not operation.ok
+            stats["last_seen"] = time.time()
+
+    def top(self, limit: int = 20, order: str = "max") -> List[dict]:
+        if order not in ORDERINGS:
+            raise ValueError(f"order must be one of {', '.join(ORDERINGS)}")
+        with self._lock:
+            rows = [
+                {
+                    "backend": backend,
+                    "operation": name,
+                    "target": target,
+                    "shape": shape,
+                    "count": stats["count"],
+                    "slow": stats["slow"],
+                    "errors": stats["errors"],
+                    "total_ms": round(stats["total"] * 1000, 3),
+                    "mean_ms": round(stats["total"] / stats["count"] * 1000, 3),
+                    "max_ms": round(stats["max"] * 1000, 3),
+                    "last_seen": stats["last_seen"],
+                }
+                for (backend, name, target, shape), stats in self._shapes.items()
+            ]
+        sort_key = {"max": "max_ms", "total": "total_ms", "mean": "mean_ms", "count": "count"}[order]
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self.slow_count = 0
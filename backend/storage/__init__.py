@@ -0,0 +1,46 @@
+"""Storage backends for the API, chosen with the STORAGE_BACKEND variable.
+
+``mongo`` (default) uses MONGO_URL and DB_NAME. ``mariadb`` uses DB_HOST,
+DB_PORT, DB_USER, DB_PASSWORD, DB_NAME and the DB_POOL_* settings.
+``memory`` keeps everything in process and needs nothing, which makes it
+the backend for tests and benchmarks. Drivers are imported only for the
+backend in use.
+"""
+from typing import Callable, Mapping
+
+from .base import BatchFailure, BatchWrite, DuplicateError, Operation, Storage, StorageUnavailable
+
+BACKENDS = ("mongo", "mariadb", "memory")
+
+
+def create_storage(backend: str, env: Mapping[str, str], promocode_key: Callable[[str], str]) -> Storage:
+    if backend == "mongo":
+        from .mongo import MongoStorage
+        return MongoStorage(env["MONGO_URL"], env["DB_NAME"], promocode_key)
+    if backend == "mariadb":
+        from .mariadb import MariaDBStorage
+        config = {
+            "host": env.get("DB_HOST", "localhost"),
+            "port": int(env.get("DB_PORT", 3306)),
+            "user": env.get("DB_USER", ""),
+            "password": env.get("DB_PASSWORD", ""),
+            "database": env.get("DB_NAME", "fermamedovik"),
+        }
+        return MariaDBStorage(
+            config,
+            promocode_key,
+            pool_size=int(env.get("DB_POOL_SIZE", 5)),
+            pool_max_age=float(env.get("DB_POOL_MAX_AGE", 3600)),
+            pool_ping_interval=float(env.get("DB_POOL_PING_INTERVAL", 30)),
+            pool_timeout=float(env.get("DB_POOL_TIMEOUT", 10)),
+        )
+    if backend == "memory":
+        from .memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+__all__ = [
+    "BACKENDS", "BatchFailure", "BatchWrite", "DuplicateError", "Operation", "Storage", "StorageUnavailable",
+    "create_storage",
+]
@@ -0,0 +1,297 @@
+"""Repository interfaces shared by every storage backend.
+
+Documents are plain dicts shaped like the API models. ``created_at`` is an
+ISO-8601 string and, with ``id``, forms the keyset used for pagination.
+Repositories return fresh dicts that callers may modify and cache.
+"""
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from .shapes import command_shape, sql_shape
+
+logger = logging.getLogger(__name__)
+
+# (created_at, id) of the last row of the previous page
+Keyset = Tuple[str, str]
+
+
+def order_day(created_at: str) -> str:
+    """UTC calendar day (YYYY-MM-DD) of an ISO ``created_at``."""
+    moment = datetime.fromisoformat(created_at)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.date().isoformat()
+
+
+def rollup_increments(order: dict, sign: int = 1) -> dict:
+    """What one order adds to (``sign=1``) or takes from (``sign=-1``) its daily rollup."""
+    return {
+        "orders": sign,
+        "revenue": sign * (order.get("total") or 0),
+        "subtotal": sign * (order.get("subtotal") or 0),
+        "discount": sign * (order.get("discount") or 0),
+    }
+
+
+class DuplicateError(Exception):
+    """A unique key such as a promocode's code is already taken."""
+
+
+class StorageUnavailable(Exception):
+    """The backend cannot serve the call right now, e.g. its pool is exhausted."""
+
+
+class ProductRepository:
+    async def list_page(self, category_id: Optional[str], limit: int, after: Optional[Keyset],
+                        fields: Optional[List[str]] = None) -> List[dict]:
+        """Up to ``limit + 1`` products in ascending (created_at, id) order.
+
+        ``fields`` limits the returned keys; id and created_at are always
+        included because the next cursor is built from them.
+        """
+        raise NotImplementedError
+
+    async def get(self, product_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def find_for_pricing(self, ids: List[str], names: List[str]) -> List[dict]:
+        """id, name, base_price and weight_prices of products matching either list."""
+        raise NotImplementedError
+
+    async def find_inline_image_ids(self, after: Optional[str], limit: int) -> List[str]:
+        """Ids, in order and greater than ``after``, of products whose image is still a data: URL."""
+        raise NotImplementedError
+
+    async def existing_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    async def create(self, doc: dict) -> None:
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]) -> None:
+        raise NotImplementedError
+
+    async def update(self, product_id: str, fields: dict) -> Optional[dict]:
+        """Apply ``fields`` and return the updated product, or None if it does not exist."""
+        raise NotImplementedError
+
+    async def delete(self, product_id: str) -> bool:
+        raise NotImplementedError
+
+    async def delete_all(self) -> int:
+        raise NotImplementedError
+
+
+class CategoryRepository:
+    async def list(self) -> List[dict]:
+        """All categories by ``order``."""
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def max_order(self) -> Optional[int]:
+        raise NotImplementedError
+
+    async def existing_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    async def create(self, doc: dict) -> None:
+        raise NotImplementedError
+
+    async def insert_many(self, docs: List[dict]) -> None:
+        raise NotImplementedError
+
+    async def update(self, category_id: str, fields: dict) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def reorder(self, category_ids: List[str]) -> None:
+        """Set each category's ``order`` to its position in ``category_ids``."""
+        raise NotImplementedError
+
+    async def delete(self, category_id: str) -> bool:
+        raise NotImplementedError
+
+    async def delete_all(self) -> int:
+        raise NotImplementedError
+
+
+class PromocodeRepository:
+    async def list(self) -> List[dict]:
+        raise NotImplementedError
+
+    async def get_by_key(self, key: str) -> Optional[dict]:
+        """Look up by normalized code (see ``promocode_key`` in server.py)."""
+        raise NotImplementedError
+
+    async def existing_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    async def create(self, doc: dict) -> None:
+        """Insert a promocode; raises DuplicateError if its code is taken."""
+        raise NotImplementedError
+
+    async def redeem(self, key: str) -> Optional[dict]:
+        """Atomically take one use of an active, non-exhausted promocode.
+
+        Returns the promocode as it was before the increment, or None if it
+        cannot be used. Must be safe against concurrent redemptions.
+        """
+        raise NotImplementedError
+
+    async def release(self, key: str) -> None:
+        """Give back one use taken by ``redeem``."""
+        raise NotImplementedError
+
+    async def delete(self, promo_id: str) -> bool:
+        raise NotImplementedError
+
+    async def delete_all(self) -> int:
+        raise NotImplementedError
+
+
+class OrderRepository:
+    async def list_page(self, limit: int, after: Optional[Keyset]) -> List[dict]:
+        """Up to ``limit + 1`` orders, newest first by (created_at, id)."""
+        raise NotImplementedError
+
+    def stream(self, start: Optional[str], end: Optional[str]) -> AsyncIterator[dict]:
+        """Orders with ``start <= created_at < end``, oldest first, with their items.
+
+        Orders are read from the database as they are consumed, so memory
+        use does not grow with the size of the range.
+        """
+        raise NotImplementedError
+
+    async def create(self, doc: dict) -> None:
+        """Save an order and count it in its daily rollup."""
+        raise NotImplementedError
+
+    async def delete(self, order_id: str) -> bool:
+        """Delete an order and take it out of its daily rollup."""
+        raise NotImplementedError
+
+    async def delete_all(self) -> int:
+        """Delete every order and every daily rollup."""
+        raise NotImplementedError
+
+
+class RollupRepository:
+    """Daily sales totals kept next to the orders.
+
+    One row per (day, promocode), with ``promocode`` "" for orders without
+    one: ``{"day", "promocode", "orders", "revenue", "subtotal", "discount"}``.
+    Days are UTC. OrderRepository.create() and delete() update the rows
+    incrementally; rebuild() recomputes them from the orders.
+    """
+
+    async def list(self, start: Optional[str], end: Optional[str]) -> List[dict]:
+        """Rows with ``start <= day <= end`` (ISO dates), oldest first."""
+        raise NotImplementedError
+
+    async def rebuild(self) -> int:
+        """Recompute every row from the orders; returns the number of rows."""
+        raise NotImplementedError
+
+
+class AboutRepository:
+    async def get(self) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def save(self, doc: dict) -> None:
+        raise NotImplementedError
+
+    async def delete_all(self) -> int:
+        raise NotImplementedError
+
+
+@dataclass
+class BatchWrite:
+    """One prepared admin batch operation; ``doc`` is the full document for
+    creates and the changed fields for updates."""
+    collection: str
+    op: str
+    id: str
+    doc: dict = field(default_factory=dict)
+
+
+@dataclass
+class BatchFailure:
+    """Where a batch stopped. ``indexes`` are the writes reported as failed;
+    with ``rolled_back`` nothing from the batch was kept."""
+    indexes: List[int]
+    message: str
+    duplicate: bool = False
+    rolled_back: bool = False
+
+
+@dataclass
+class Operation:
+    """One round trip to the database, as reported to storage listeners.
+
+    ``name`` is the driver command (find, insert, ...) or SQL verb, and
+    ``target`` the collection or table it touched, when known.
+    ``statement`` is the raw command document or SQL text.
+    """
+    backend: str
+    name: str
+    target: str
+    duration: float
+    ok: bool = True
+    statement: Any = None
+
+    def shape(self) -> str:
+        """The statement with literal values redacted; computed on demand."""
+        if isinstance(self.statement, str):
+            return sql_shape(self.statement)
+        if isinstance(self.statement, Mapping):
+            return command_shape(self.name, self.statement)
+        return ""
+
+
+class Storage:
+    """A storage backend: one repository per collection plus lifecycle hooks."""
+
+    name = "base"
+    products: ProductRepository
+    categories: CategoryRepository
+    promocodes: PromocodeRepository
+    orders: OrderRepository
+    rollups: RollupRepository
+    about: AboutRepository
+
+    def __init__(self):
+        self.listeners: List[Callable[[Operation], None]] = []
+
+    def add_listener(self, listener: Callable[[Operation], None]) -> None:
+        """Call ``listener`` after every database operation.
+
+        Listeners may run on driver threads and must be thread-safe.
+        """
+        self.listeners.append(listener)
+
+    def emit(self, operation: Operation) -> None:
+        for listener in self.listeners:
+            try:
+                listener(operation)
+            except Exception:
+                logger.exception("Storage listener failed")
+
+    def repository(self, collection: str):
+        return getattr(self, collection)
+
+    async def prepare(self) -> None:
+        """Create schema and indexes; called once at startup."""
+
+    async def index_report(self) -> Dict[str, dict]:
+        return {}
+
+    async def apply_batch(self, writes: List[BatchWrite]) -> Optional[BatchFailure]:
+        """Apply writes in order, stopping at the first failure."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
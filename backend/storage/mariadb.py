@@ -0,0 +1,997 @@
+"""MariaDB/MySQL storage through pymysql.
+
+pymysql is blocking, so every call borrows a pooled connection and runs on
+a dedicated thread pool with one thread per connection. Each repository
+call is one transaction. Reads the tables of databases created by the
+earlier standalone hosting server and adds the columns the full API needs
+(category order, about page, order line product ids).
+deploy/server_mariadb.py runs the API on this backend.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Optional
+
+import pymysql
+import pymysql.cursors
+
+from .base import (
+    AboutRepository,
+    BatchFailure,
+    BatchWrite,
+    CategoryRepository,
+    DuplicateError,
+    Operation,
+    OrderRepository,
+    ProductRepository,
+    PromocodeRepository,
+    RollupRepository,
+    Storage,
+    StorageUnavailable,
+    order_day,
+    rollup_increments,
+)
+
+logger = logging.getLogger(__name__)
+
+ER_DUP_ENTRY = 1062
+ABOUT_ID = "about-us"
+PROMOCODE_COLLATION = "utf8mb4_unicode_ci"
+
+# Last item a stream() producer thread hands over
+_STREAM_END = object()
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS categories (
+        id VARCHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        slug VARCHAR(255) NOT NULL,
+        sort_order INT NOT NULL DEFAULT 0
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS products (
+        id VARCHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        category_id VARCHAR(36),
+        image TEXT,
+        base_price DECIMAL(10,2) NOT NULL,
+        created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6),
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE SET NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS weight_prices (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        product_id VARCHAR(36) NOT NULL,
+        weight VARCHAR(50) NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        sort_order INT DEFAULT 0,
+        FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    f"""CREATE TABLE IF NOT EXISTS promocodes (
+        id VARCHAR(36) PRIMARY KEY,
+        code VARCHAR(100) NOT NULL UNIQUE COLLATE {PROMOCODE_COLLATION},
+        discount_type ENUM('percent', 'fixed') NOT NULL,
+        discount_value DECIMAL(10,2) NOT NULL,
+        max_uses INT NOT NULL,
+        current_uses INT DEFAULT 0,
+        is_active BOOLEAN DEFAULT TRUE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS orders (
+        id VARCHAR(36) PRIMARY KEY,
+        customer_name VARCHAR(255) NOT NULL,
+        customer_phone VARCHAR(50) NOT NULL,
+        subtotal DECIMAL(10,2) NOT NULL,
+        discount DECIMAL(10,2) DEFAULT 0,
+        total DECIMAL(10,2) NOT NULL,
+        promocode VARCHAR(100),
+        created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS order_items (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        order_id VARCHAR(36) NOT NULL,
+        product_id VARCHAR(36),
+        name VARCHAR(255) NOT NULL,
+        weight VARCHAR(50),
+        price DECIMAL(10,2) NOT NULL,
+        quantity INT NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS daily_rollups (
+        day DATE NOT NULL,
+        promocode VARCHAR(100) NOT NULL DEFAULT '',
+        orders INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        subtotal DECIMAL(14,2) NOT NULL DEFAULT 0,
+        discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, promocode)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    """CREATE TABLE IF NOT EXISTS about (
+        id VARCHAR(36) PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        description TEXT,
+        features TEXT
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+]
+
+# Columns added after the shared-hosting schema was first deployed
+COLUMNS = {
+    "categories": [("sort_order", "INT NOT NULL DEFAULT 0")],
+    "order_items": [("product_id", "VARCHAR(36)")],
+}
+
+INDEXES = {
+    "categories": [("idx_categories_sort_order", "sort_order")],
+    "products": [
+        ("idx_products_created_at", "created_at, id"),
+        ("idx_products_category_created_at", "category_id, created_at, id"),
+        ("idx_products_name", "name"),
+    ],
+    "weight_prices": [("idx_weight_prices_product_sort", "product_id, sort_order")],
+    "orders": [("idx_orders_created_at", "created_at, id")],
+}
+
+PRODUCT_COLUMNS = ["id", "name", "description", "category_id", "image", "base_price", "created_at"]
+PROMOCODE_COLUMNS = ["id", "code", "discount_type", "discount_value", "max_uses", "current_uses", "is_active"]
+ORDER_COLUMNS = ["id", "customer_name", "customer_phone", "subtotal", "discount", "total", "promocode", "created_at"]
+# order_items columns in MariaDBOrders.stream(), prefixed to keep them apart from the order's
+ITEM_COLUMNS = ["item_product_id", "item_name", "item_weight", "item_price", "item_quantity"]
+
+
+STATEMENT_TARGET = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)", re.IGNORECASE)
+
+
+def placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def to_db_time(value: str) -> datetime:
+    """ISO string to the naive UTC datetime stored in DATETIME columns."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def from_row(row: dict) -> dict:
+    """Decimal to float, DATETIME to an ISO string in UTC."""
+    for key, value in row.items():
+        if isinstance(value, Decimal):
+            row[key] = float(value)
+        elif isinstance(value, datetime):
+            row[key] = value.replace(tzinfo=timezone.utc).isoformat()
+    return row
+
+
+class PoolTimeout(StorageUnavailable):
+    pass
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of pymysql connections.
+
+    Idle connections are handed out LIFO so rarely needed ones age out.
+    Connections older than ``max_age`` are replaced and ones idle longer
+    than ``ping_interval`` are pinged before reuse.
+    """
+
+    def __init__(self, config: dict, size: int, max_age: float, ping_interval: float, timeout: float):
+        self.config = config
+        self.size = size
+        self.max_age = max_age
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created, last_used)
+        self._born = {}
+        self._open = 0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout("No database connection available")
+                self._cond.wait(remaining)
+
+        if conn is not None:
+            now = time.monotonic()
+            if now - created > self.max_age:
+                self._discard(conn, reopen=True)
+                conn = None
+            elif now - last_used > self.ping_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except pymysql.Error:
+                    self._discard(conn, reopen=True)
+                    conn = None
+        if conn is None:
+            try:
+                conn = pymysql.connect(**self.config)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._born[conn] = time.monotonic()
+        return conn
+
+    def release(self, conn, broken: bool = False):
+        if broken:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, self._born[conn], time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn, reopen: bool = False):
+        """Close ``conn``; with ``reopen`` the caller keeps its slot."""
+        try:
+            conn.close()
+        except pymysql.Error:
+            pass
+        with self._cond:
+            self._born.pop(conn, None)
+            if not reopen:
+                self._open -= 1
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+
+class _BatchAbort(Exception):
+    def __init__(self, failure: BatchFailure):
+        self.failure = failure
+
+
+class _Table:
+    table = ""
+
+    def __init__(self, storage: "MariaDBStorage"):
+        self.storage = storage
+
+    def _existing_ids(self, cursor, ids):
+        if not ids:
+            return set()
+        cursor.execute(f"SELECT id FROM {self.table} WHERE id IN ({placeholders(ids)})", list(ids))
+        return {row["id"] for row in cursor.fetchall()}
+
+    async def existing_ids(self, ids):
+        return await self.storage.run(self._existing_ids, list(ids))
+
+    def _delete(self, cursor, doc_id):
+        cursor.execute(f"DELETE FROM {self.table} WHERE id=%s", (doc_id,))
+        return cursor.rowcount > 0
+
+    async def delete(self, doc_id):
+        return await self.storage.run(self._delete, doc_id)
+
+    def _delete_all(self, cursor):
+        cursor.execute(f"DELETE FROM {self.table}")
+        return cursor.rowcount
+
+    async def delete_all(self):
+        return await self.storage.run(self._delete_all)
+
+    async def create(self, doc):
+        await self.insert_many([doc])
+
+    async def insert_many(self, docs):
+        if docs:
+            await self.storage.run(self._insert, docs)
+
+    async def update(self, doc_id, fields):
+        return await self.storage.run(self._update, doc_id, fields)
+
+
+class MariaDBProducts(_Table, ProductRepository):
+    table = "products"
+
+    @staticmethod
+    def _weight_prices(cursor, product_ids) -> dict:
+        grouped = {product_id: [] for product_id in product_ids}
+        if product_ids:
+            cursor.execute(
+                f"""SELECT product_id, weight, price FROM weight_prices
+                    WHERE product_id IN ({placeholders(product_ids)}) ORDER BY product_id, sort_order""",
+                list(product_ids),
+            )
+            for row in cursor.fetchall():
+                grouped[row.pop("product_id")].append(from_row(row))
+        return grouped
+
+    @staticmethod
+    def _insert_weight_prices(cursor, weight_prices: dict):
+        rows = [
+            (product_id, wp["weight"], wp["price"], i)
+            for product_id, items in weight_prices.items()
+            for i, wp in enumerate(items)
+        ]
+        if rows:
+            cursor.executemany(
+                "INSERT INTO weight_prices (product_id, weight, price, sort_order) VALUES (%s, %s, %s, %s)", rows
+            )
+
+    def _attach_weight_prices(self, cursor, products):
+        weight_prices = self._weight_prices(cursor, [p["id"] for p in products])
+        for product in products:
+            product["weight_prices"] = weight_prices[product["id"]]
+
+    def _list_page(self, cursor, category_id, limit, after, fields):
+        columns = PRODUCT_COLUMNS
+        if fields:
+            columns = [c for c in PRODUCT_COLUMNS if c in fields or c in ("id", "created_at")]
+        where, params = [], []
+        if category_id:
+            where.append("category_id=%s")
+            params.append(category_id)
+        if after:
+            created_at = to_db_time(after[0])
+            where.append("(created_at > %s OR (created_at = %s AND id > %s))")
+            params += [created_at, created_at, after[1]]
+        sql = f"SELECT {', '.join(columns)} FROM products"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cursor.execute(sql + " ORDER BY created_at, id LIMIT %s", params + [limit + 1])
+        products = [from_row(row) for row in cursor.fetchall()]
+        if not fields or "weight_prices" in fields:
+            self._attach_weight_prices(cursor, products)
+        return products
+
+    async def list_page(self, category_id, limit, after, fields=None):
+        return await self.storage.run(self._list_page, category_id, limit, after, fields)
+
+    def _get(self, cursor, product_id):
+        cursor.execute(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products WHERE id=%s", (product_id,))
+        product = cursor.fetchone()
+        if product is None:
+            return None
+        product = from_row(product)
+        self._attach_weight_prices(cursor, [product])
+        return product
+
+    async def get(self, product_id):
+        return await self.storage.run(self._get, product_id)
+
+    def _find_for_pricing(self, cursor, ids, names):
+        clauses, params = [], []
+        if ids:
+            clauses.append(f"id IN ({placeholders(ids)})")
+            params += ids
+        if names:
+            clauses.append(f"name IN ({placeholders(names)})")
+            params += names
+        if not clauses:
+            return []
+        cursor.execute(f"SELECT id, name, base_price FROM products WHERE {' OR '.join(clauses)}", params)
+        products = [from_row(row) for row in cursor.fetchall()]
+        self._attach_weight_prices(cursor, products)
+        return products
+
+    async def find_for_pricing(self, ids, names):
+        return await self.storage.run(self._find_for_pricing, list(ids), list(names))
+
+    def _find_inline_image_ids(self, cursor, after, limit):
+        sql, params = "SELECT id FROM products WHERE image LIKE %s", ["data:%"]
+        if after is not None:
+            sql += " AND id > %s"
+            params.append(after)
+        cursor.execute(sql + " ORDER BY id LIMIT %s", params + [limit])
+        return [row["id"] for row in cursor.fetchall()]
+
+    async def find_inline_image_ids(self, after, limit):
+        return await self.storage.run(self._find_inline_image_ids, after, limit)
+
+    def _insert(self, cursor, docs):
+        cursor.executemany(
+            f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES ({placeholders(PRODUCT_COLUMNS)})",
+            [
+                tuple(to_db_time(doc[c]) if c == "created_at" else doc.get(c) for c in PRODUCT_COLUMNS)
+                for doc in docs
+            ],
+        )
+        self._insert_weight_prices(cursor, {doc["id"]: doc.get("weight_prices") or [] for doc in docs})
+
+    def _update(self, cursor, product_id, fields):
+        if not self._existing_ids(cursor, [product_id]):
+            return None
+        columns = [c for c in fields if c in PRODUCT_COLUMNS and c not in ("id", "created_at")]
+        if columns:
+            cursor.execute(
+                f"UPDATE products SET {', '.join(f'{c}=%s' for c in columns)} WHERE id=%s",
+                [fields[c] for c in columns] + [product_id],
+            )
+        if "weight_prices" in fields:
+            cursor.execute("DELETE FROM weight_prices WHERE product_id=%s", (product_id,))
+            self._insert_weight_prices(cursor, {product_id: fields["weight_prices"]})
+        return self._get(cursor, product_id)
+
+
+class MariaDBCategories(_Table, CategoryRepository):
+    table = "categories"
+
+    @staticmethod
+    def _from_db(row):
+        row["order"] = row.pop("sort_order")
+        return row
+
+    def _list(self, cursor):
+        cursor.execute("SELECT id, name, slug, sort_order FROM categories ORDER BY sort_order, id")
+        return [self._from_db(row) for row in cursor.fetchall()]
+
+    async def list(self):
+        return await self.storage.run(self._list)
+
+    def _count(self, cursor):
+        cursor.execute("SELECT COUNT(*) AS count FROM categories")
+        return cursor.fetchone()["count"]
+
+    async def count(self):
+        return await self.storage.run(self._count)
+
+    def _max_order(self, cursor):
+        cursor.execute("SELECT MAX(sort_order) AS max_order FROM categories")
+        return cursor.fetchone()["max_order"]
+
+    async def max_order(self):
+        return await self.storage.run(self._max_order)
+
+    def _insert(self, cursor, docs):
+        cursor.executemany(
+            "INSERT INTO categories (id, name, slug, sort_order) VALUES (%s, %s, %s, %s)",
+            [(doc["id"], doc["name"], doc["slug"], doc.get("order", 0)) for doc in docs],
+        )
+
+    def _update(self, cursor, category_id, fields):
+        if not self._existing_ids(cursor, [category_id]):
+            return None
+        columns = {"name": "name", "slug": "slug", "order": "sort_order"}
+        changed = [k for k in fields if k in columns]
+        if changed:
+            cursor.execute(
+                f"UPDATE categories SET {', '.join(f'{columns[k]}=%s' for k in changed)} WHERE id=%s",
+                [fields[k] for k in changed] + [category_id],
+            )
+        cursor.execute("SELECT id, name, slug, sort_order FROM categories WHERE id=%s", (category_id,))
+        return self._from_db(cursor.fetchone())
+
+    def _reorder(self, cursor, category_ids):
+        cursor.executemany(
+            "UPDATE categories SET sort_order=%s WHERE id=%s",
+            [(index, category_id) for index, category_id in enumerate(category_ids)],
+        )
+
+    async def reorder(self, category_ids):
+        if category_ids:
+            await self.storage.run(self._reorder, list(category_ids))
+
+
+class MariaDBPromocodes(_Table, PromocodeRepository):
+    table = "promocodes"
+
+    def __init__(self, storage, promocode_key):
+        super().__init__(storage)
+        self.promocode_key = promocode_key
+
+    def _from_db(self, row):
+        row = from_row(row)
+        row["is_active"] = bool(row["is_active"])
+        row["code_key"] = self.promocode_key(row["code"])
+        return row
+
+    def _list(self, cursor):
+        cursor.execute(f"SELECT {', '.join(PROMOCODE_COLUMNS)} FROM promocodes ORDER BY code")
+        return [self._from_db(row) for row in cursor.fetchall()]
+
+    async def list(self):
+        return await self.storage.run(self._list)
+
+    def _get_by_key(self, cursor, key):
+        # The column collation is case-insensitive, so this is one UNIQUE index seek
+        cursor.execute(f"SELECT {', '.join(PROMOCODE_COLUMNS)} FROM promocodes WHERE code=%s", (key,))
+        row = cursor.fetchone()
+        return self._from_db(row) if row else None
+
+    async def get_by_key(self, key):
+        return await self.storage.run(self._get_by_key, key)
+
+    def _insert(self, cursor, docs):
+        try:
+            cursor.executemany(
+                f"INSERT INTO promocodes ({', '.join(PROMOCODE_COLUMNS)}) VALUES ({placeholders(PROMOCODE_COLUMNS)})",
+                [
+                    (doc["id"], doc["code"], doc["discount_type"], doc["discount_value"], doc["max_uses"],
+                     doc.get("current_uses", 0), doc.get("is_active", True))
+                    for doc in docs
+                ],
+            )
+        except pymysql.IntegrityError as e:
+            if e.args[0] == ER_DUP_ENTRY:
+                raise DuplicateError(", ".join(doc["code"] for doc in docs)) from e
+            raise
+
+    def _update(self, cursor, promo_id, fields):
+        if not self._existing_ids(cursor, [promo_id]):
+            return None
+        columns = [c for c in fields if c in PROMOCODE_COLUMNS and c != "id"]
+        if columns:
+            try:
+                cursor.execute(
+                    f"UPDATE promocodes SET {', '.join(f'{c}=%s' for c in columns)} WHERE id=%s",
+                    [fields[c] for c in columns] + [promo_id],
+                )
+            except pymysql.IntegrityError as e:
+                if e.args[0] == ER_DUP_ENTRY:
+                    raise DuplicateError(fields.get("code")) from e
+                raise
+        cursor.execute(f"SELECT {', '.join(PROMOCODE_COLUMNS)} FROM promocodes WHERE id=%s", (promo_id,))
+        return self._from_db(cursor.fetchone())
+
+    def _redeem(self, cursor, key):
+        cursor.execute(
+            """UPDATE promocodes SET current_uses = current_uses + 1
+               WHERE code=%s AND is_active=1 AND current_uses < max_uses""",
+            (key,),
+        )
+        if cursor.rowcount != 1:
+            return None
+        promo = self._get_by_key(cursor, key)
+        promo["current_uses"] -= 1
+        return promo
+
+    async def redeem(self, key):
+        return await self.storage.run(self._redeem, key)
+
+    def _release(self, cursor, key):
+        cursor.execute(
+            "UPDATE promocodes SET current_uses = current_uses - 1 WHERE code=%s AND current_uses > 0", (key,)
+        )
+
+    async def release(self, key):
+        await self.storage.run(self._release, key)
+
+
+class MariaDBOrders(_Table, OrderRepository):
+    table = "orders"
+
+    def _list_page(self, cursor, limit, after):
+        sql, params = f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders", []
+        if after:
+            created_at = to_db_time(after[0])
+            sql += " WHERE (created_at < %s OR (created_at = %s AND id < %s))"
+            params += [created_at, created_at, after[1]]
+        cursor.execute(sql + " ORDER BY created_at DESC, id DESC LIMIT %s", params + [limit + 1])
+        orders = [from_row(row) for row in cursor.fetchall()]
+        items = {order["id"]: [] for order in orders}
+        if orders:
+            cursor.execute(
+                f"""SELECT order_id, product_id, name, weight, price, quantity FROM order_items
+                    WHERE order_id IN ({placeholders(items)}) ORDER BY order_id, id""",
+                list(items),
+            )
+            for row in cursor.fetchall():
+                items[row.pop("order_id")].append(from_row(row))
+        for order in orders:
+            order["items"] = items[order["id"]]
+        return orders
+
+    async def list_page(self, limit, after):
+        return await self.storage.run(self._list_page, limit, after)
+
+    async def stream(self, start, end):
+        # One joined query, so the single unbuffered result holds the items
+        # too; rows of an order are consecutive and are folded back into it
+        where, params = [], []
+        if start:
+            where.append("o.created_at >= %s")
+            params.append(to_db_time(start))
+        if end:
+            where.append("o.created_at < %s")
+            params.append(to_db_time(end))
+        sql = f"""SELECT {', '.join(f'o.{c}' for c in ORDER_COLUMNS)},
+                         i.product_id AS item_product_id, i.name AS item_name, i.weight AS item_weight,
+                         i.price AS item_price, i.quantity AS item_quantity
+                  FROM orders o LEFT JOIN order_items i ON i.order_id = o.id
+                  {'WHERE ' + ' AND '.join(where) if where else ''}
+                  ORDER BY o.created_at, o.id, i.id"""
+        order = None
+        async for row in self.storage.stream(sql, params):
+            row = from_row(row)
+            item = {key[5:]: row.pop(key) for key in ITEM_COLUMNS}
+            if order is None or order["id"] != row["id"]:
+                if order is not None:
+                    yield order
+                order = {**row, "items": []}
+            if item["name"] is not None:
+                order["items"].append(item)
+        if order is not None:
+            yield order
+
+    def _insert(self, cursor, docs):
+        cursor.executemany(
+            f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) VALUES ({placeholders(ORDER_COLUMNS)})",
+            [
+                tuple(to_db_time(doc[c]) if c == "created_at" else doc.get(c) for c in ORDER_COLUMNS)
+                for doc in docs
+            ],
+        )
+        cursor.executemany(
+            "INSERT INTO order_items (order_id, product_id, name, weight, price, quantity) VALUES (%s, %s, %s, %s, %s, %s)",
+            [
+                (doc["id"], item.get("product_id"), item["name"], item.get("weight"), item["price"], item["quantity"])
+                for doc in docs for item in doc["items"]
+            ],
+        )
+        MariaDBRollups.add(cursor, docs, 1)
+
+    def _delete(self, cursor, order_id):
+        cursor.execute(f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders WHERE id=%s FOR UPDATE", (order_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        cursor.execute("DELETE FROM orders WHERE id=%s", (order_id,))
+        MariaDBRollups.add(cursor, [from_row(row)], -1)
+        return True
+
+    def _delete_all(self, cursor):
+        deleted = super()._delete_all(cursor)
+        cursor.execute("DELETE FROM daily_rollups")
+        return deleted
+
+
+class MariaDBRollups(RollupRepository):
+    """Rollups are written in the transaction that saves or deletes the orders."""
+
+    def __init__(self, storage: "MariaDBStorage"):
+        self.storage = storage
+
+    @staticmethod
+    def add(cursor, docs, sign: int):
+        rows = []
+        for doc in docs:
+            increments = rollup_increments(doc, sign)
+            rows.append((
+                order_day(doc["created_at"]), doc.get("promocode") or "",
+                increments["orders"], increments["revenue"], increments["subtotal"], increments["discount"],
+            ))
+        cursor.executemany(
+            """INSERT INTO daily_rollups (day, promocode, orders, revenue, subtotal, discount)
+               VALUES (%s, %s, %s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE orders = orders + VALUES(orders), revenue = revenue + VALUES(revenue),
+                   subtotal = subtotal + VALUES(subtotal), discount = discount + VALUES(discount)""",
+            rows,
+        )
+        if sign < 0:
+            cursor.executemany(
+                "DELETE FROM daily_rollups WHERE day=%s AND promocode=%s AND orders <= 0", [row[:2] for row in rows]
+            )
+
+    @staticmethod
+    def _list(cursor, start, end):
+        where, params = [], []
+        if start:
+            where.append("day >= %s")
+            params.append(start)
+        if end:
+            where.append("day <= %s")
+            params.append(end)
+        cursor.execute(
+            f"""SELECT day, promocode, orders, revenue, subtotal, discount FROM daily_rollups
+                {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY day, promocode""",
+            params,
+        )
+        rows = [from_row(row) for row in cursor.fetchall()]
+        for row in rows:
+            row["day"] = row["day"].isoformat()
+        return rows
+
+    async def list(self, start, end):
+        return await self.storage.run(self._list, start, end)
+
+    @staticmethod
+    def _rebuild(cursor):
+        cursor.execute("DELETE FROM daily_rollups")
+        cursor.execute(
+            """INSERT INTO daily_rollups (day, promocode, orders, revenue, subtotal, discount)
+               SELECT DATE(created_at), COALESCE(promocode, ''), COUNT(*), SUM(total), SUM(subtotal),
+                      SUM(COALESCE(discount, 0))
+               FROM orders GROUP BY DATE(created_at), COALESCE(promocode, '')"""
+        )
+        return cursor.rowcount
+
+    async def rebuild(self):
+        return await self.storage.run(self._rebuild)
+
+
+class MariaDBAbout(AboutRepository):
+    def __init__(self, storage: "MariaDBStorage"):
+        self.storage = storage
+
+    @staticmethod
+    def _get(cursor):
+        cursor.execute("SELECT id, title, description, features FROM about WHERE id=%s", (ABOUT_ID,))
+        row = cursor.fetchone()
+        if row:
+            row["features"] = json.loads(row["features"] or "[]")
+        return row
+
+    async def get(self):
+        return await self.storage.run(self._get)
+
+    @staticmethod
+    def _save(cursor, doc):
+        cursor.execute(
+            """INSERT INTO about (id, title, description, features) VALUES (%s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE title=VALUES(title), description=VALUES(description), features=VALUES(features)""",
+            (ABOUT_ID, doc["title"], doc["description"], json.dumps(doc["features"], ensure_ascii=False)),
+        )
+
+    async def save(self, doc):
+        await self.storage.run(self._save, doc)
+
+    @staticmethod
+    def _delete_all(cursor):
+        cursor.execute("DELETE FROM about")
+        return cursor.rowcount
+
+    async def delete_all(self):
+        return await self.storage.run(self._delete_all)
+
+
+class TimedCursor:
+    """Cursor proxy that reports each execute/executemany as a storage Operation."""
+
+    def __init__(self, cursor, storage: Storage):
+        self._cursor = cursor
+        self._storage = storage
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def _timed(self, method, query, args):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = method(query, args)
+            ok = True
+            return result
+        finally:
+            match = STATEMENT_TARGET.search(query)
+            self._storage.emit(Operation(
+                "mariadb",
+                query.split(None, 1)[0].upper(),
+                match.group(1) if match else "",
+                time.perf_counter() - started,
+                ok,
+                query,
+            ))
+
+
+class MariaDBStorage(Storage):
+    name = "mariadb"
+
+    def __init__(self, config: dict, promocode_key, pool_size: int = 5, pool_max_age: float = 3600,
+                 pool_ping_interval: float = 30, pool_timeout: float = 10):
+        super().__init__()
+        config = {**config, "charset": "utf8mb4", "cursorclass": pymysql.cursors.DictCursor}
+        self.pool = ConnectionPool(config, pool_size, pool_max_age, pool_ping_interval, pool_timeout)
+        # One thread per connection, so a running call never waits for the pool
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="mariadb")
+        self.products = MariaDBProducts(self)
+        self.categories = MariaDBCategories(self)
+        self.promocodes = MariaDBPromocodes(self, promocode_key)
+        self.orders = MariaDBOrders(self)
+        self.rollups = MariaDBRollups(self)
+        self.about = MariaDBAbout(self)
+
+    def _call(self, fn, *args):
+        conn = self.pool.acquire()
+        broken = False
+        try:
+            conn.begin()
+            result = fn(TimedCursor(conn.cursor(), self), *args)
+            conn.commit()
+            return result
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            broken = True
+            raise
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.release(conn, broken)
+
+    async def run(self, fn, *args):
+        """Run ``fn(cursor, *args)`` in one transaction on the database thread pool."""
+        loop = asyncio.get_running_loop()
+        # Like Motor, carry the caller's context (per-request timing) into the thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, self._call, fn, *args))
+
+    async def stream(self, sql: str, params, batch_size: int = 500):
+        """Rows of one query from an unbuffered server-side cursor, ``batch_size`` at a time.
+
+        One database thread acquires the connection, runs the query, hands the
+        batches over through a small queue and releases the connection, so the
+        connection never leaves that thread and nothing is acquired until the
+        stream is iterated. A stream closed early stops the thread; the
+        connection still has unread rows, so it is discarded rather than reused.
+        """
+        loop = asyncio.get_running_loop()
+        batches = queue.Queue(maxsize=2)
+        stop = threading.Event()
+
+        def hand_over(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+
+        def produce():
+            conn = None
+            finished = False
+            try:
+                conn = self.pool.acquire()
+                cursor = TimedCursor(conn.cursor(pymysql.cursors.SSDictCursor), self)
+                cursor.execute(sql, params)
+                while not stop.is_set():
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        cursor.close()
+                        conn.rollback()
+                        finished = True
+                        break
+                    hand_over(rows)
+                hand_over(_STREAM_END)
+            except BaseException as exc:
+                hand_over(exc)
+            finally:
+                if conn is not None:
+                    self.pool.release(conn, broken=not finished)
+                # Wakes a reader still waiting after the stream was closed
+                try:
+                    batches.put_nowait(_STREAM_END)
+                except queue.Full:
+                    pass
+
+        context = contextvars.copy_context()
+        loop.run_in_executor(self.executor, functools.partial(context.run, produce))
+        try:
+            while True:
+                item = await loop.run_in_executor(None, batches.get)
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                for row in item:
+                    yield row
+        finally:
+            stop.set()
+
+    def _schema_report(self, cursor, create: bool) -> dict:
+        if create:
+            for statement in TABLES:
+                cursor.execute(statement)
+        cursor.execute(
+            """SELECT TABLE_NAME, COLUMN_NAME, COLLATION_NAME FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE()"""
+        )
+        columns = {(row["TABLE_NAME"], row["COLUMN_NAME"]): row["COLLATION_NAME"] for row in cursor.fetchall()}
+        cursor.execute(
+            """SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS
+               WHERE TABLE_SCHEMA = DATABASE()"""
+        )
+        existing = {(row["TABLE_NAME"], row["INDEX_NAME"]) for row in cursor.fetchall()}
+        report = {}
+        for table in sorted(set(INDEXES) | set(COLUMNS)):
+            created, missing = [], []
+            for column, definition in COLUMNS.get(table, []):
+                if (table, column) in columns:
+                    continue
+                if create:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    created.append(column)
+                else:
+                    missing.append(column)
+            for name, index_columns in INDEXES.get(table, []):
+                if (table, name) in existing:
+                    continue
+                if create:
+                    cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({index_columns})")
+                    created.append(name)
+                else:
+                    missing.append(name)
+            report[table] = {"created": created, "missing": missing}
+        collation = columns.get(("promocodes", "code"))
+        if create and collation and collation != PROMOCODE_COLLATION:
+            promocodes = report.setdefault("promocodes", {"created": [], "missing": []})
+            try:
+                cursor.execute(
+                    f"ALTER TABLE promocodes MODIFY code VARCHAR(100) NOT NULL COLLATE {PROMOCODE_COLLATION}"
+                )
+                promocodes["created"].append("code collation")
+            except pymysql.IntegrityError:
+                # Codes differing only in case have to be merged by hand; keep starting up
+                logger.warning("promocodes.code has case-insensitive duplicates; collation left as %s", collation)
+                promocodes["missing"].append("code collation")
+        return report
+
+    async def prepare(self):
+        try:
+            report = await self.run(self._schema_report, True)
+        except pymysql.MySQLError as exc:
+            logger.error("Schema bootstrap failed: %s", exc)
+            return
+        created = {table: r["created"] for table, r in report.items() if r["created"]}
+        if created:
+            logger.info("Created columns and indexes: %s", created)
+
+    async def index_report(self):
+        return await self.run(self._schema_report, False)
+
+    def _apply_batch(self, cursor, writes: List[BatchWrite]):
+        # Consecutive creates or deletes on one table share an executemany
+        groups = []
+        for index, write in enumerate(writes):
+            key = (write.collection, write.op)
+            if groups and groups[-1][0] == key and write.op != "update":
+                groups[-1][1].append(index)
+            else:
+                groups.append((key, [index]))
+        for (collection, op), indexes in groups:
+            repo = self.repository(collection)
+            try:
+                if op == "create":
+                    repo._insert(cursor, [writes[i].doc for i in indexes])
+                elif op == "delete":
+                    cursor.executemany(
+                        f"DELETE FROM {repo.table} WHERE id=%s", [(writes[i].id,) for i in indexes]
+                    )
+                else:
+                    repo._update(cursor, writes[indexes[0]].id, writes[indexes[0]].doc)
+            except DuplicateError as e:
+                raise _BatchAbort(BatchFailure(indexes, f"Duplicate key: {e}", duplicate=True, rolled_back=True))
+            except pymysql.MySQLError as e:
+                message = str(e.args[-1]) if e.args else "Write failed"
+                raise _BatchAbort(BatchFailure(indexes, message, rolled_back=True))
+
+    async def apply_batch(self, writes: List[BatchWrite]) -> Optional[BatchFailure]:
+        """The whole batch is one transaction: any failure rolls all of it back."""
+        try:
+            await self.run(self._apply_batch, writes)
+        except _BatchAbort as abort:
+            return abort.failure
+        return None
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        self.pool.close()
@@ -0,0 +1,250 @@
+"""Pure in-process storage for tests and benchmarks; nothing is persisted.
+
+Every method runs without awaiting anything, so on a single event loop each
+call is atomic, which gives promocode redemption the same guarantee the
+database backends get from conditional updates.
+"""
+import copy
+from typing import Dict, List, Optional
+
+from .base import (
+    AboutRepository,
+    BatchFailure,
+    BatchWrite,
+    CategoryRepository,
+    DuplicateError,
+    OrderRepository,
+    ProductRepository,
+    PromocodeRepository,
+    RollupRepository,
+    Storage,
+    order_day,
+    rollup_increments,
+)
+
+
+def _keyset(doc: dict) -> tuple:
+    return (doc.get("created_at") or "", doc["id"])
+
+
+class _Collection:
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+
+    async def existing_ids(self, ids):
+        return {doc_id for doc_id in ids if doc_id in self.docs}
+
+    async def create(self, doc):
+        self.docs[doc["id"]] = copy.deepcopy(doc)
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            await self.create(doc)
+
+    async def update(self, doc_id, fields):
+        doc = self.docs.get(doc_id)
+        if doc is None:
+            return None
+        doc.update(copy.deepcopy(fields))
+        return copy.deepcopy(doc)
+
+    async def delete(self, doc_id):
+        return self.docs.pop(doc_id, None) is not None
+
+    async def delete_all(self):
+        count = len(self.docs)
+        self.docs.clear()
+        return count
+
+
+class MemoryProducts(_Collection, ProductRepository):
+    async def list_page(self, category_id, limit, after, fields=None):
+        docs = sorted(
+            (d for d in self.docs.values() if not category_id or d.get("category_id") == category_id),
+            key=_keyset,
+        )
+        if after:
+            docs = [d for d in docs if _keyset(d) > tuple(after)]
+        docs = docs[:limit + 1]
+        if fields:
+            keep = {*fields, "id", "created_at"}
+            return [{k: copy.deepcopy(v) for k, v in d.items() if k in keep} for d in docs]
+        return copy.deepcopy(docs)
+
+    async def get(self, product_id):
+        return copy.deepcopy(self.docs.get(product_id))
+
+    async def find_for_pricing(self, ids, names):
+        ids, names = set(ids), set(names)
+        return [
+            copy.deepcopy({k: d.get(k) for k in ("id", "name", "base_price", "weight_prices")})
+            for d in self.docs.values()
+            if d["id"] in ids or d["name"] in names
+        ]
+
+    async def find_inline_image_ids(self, after, limit):
+        return sorted(
+            d["id"] for d in self.docs.values()
+            if (d.get("image") or "").startswith("data:") and (after is None or d["id"] > after)
+        )[:limit]
+
+
+class MemoryCategories(_Collection, CategoryRepository):
+    async def list(self):
+        return copy.deepcopy(sorted(self.docs.values(), key=lambda d: d.get("order", 0)))
+
+    async def count(self):
+        return len(self.docs)
+
+    async def max_order(self):
+        return max((d.get("order", 0) for d in self.docs.values()), default=None)
+
+    async def reorder(self, category_ids):
+        for index, category_id in enumerate(category_ids):
+            if category_id in self.docs:
+                self.docs[category_id]["order"] = index
+
+
+class MemoryPromocodes(_Collection, PromocodeRepository):
+    def _by_key(self, key) -> Optional[dict]:
+        return next((d for d in self.docs.values() if d["code_key"] == key), None)
+
+    async def list(self):
+        return copy.deepcopy(list(self.docs.values()))
+
+    async def get_by_key(self, key):
+        return copy.deepcopy(self._by_key(key))
+
+    async def create(self, doc):
+        if self._by_key(doc["code_key"]) is not None:
+            raise DuplicateError(doc["code"])
+        await super().create(doc)
+
+    async def update(self, doc_id, fields):
+        if "code_key" in fields:
+            other = self._by_key(fields["code_key"])
+            if other is not None and other["id"] != doc_id:
+                raise DuplicateError(fields["code_key"])
+        return await super().update(doc_id, fields)
+
+    async def redeem(self, key):
+        promo = self._by_key(key)
+        if promo is None or promo.get("is_active") is False:
+            return None
+        if promo.get("current_uses", 0) >= promo.get("max_uses", 0):
+            return None
+        before = copy.deepcopy(promo)
+        promo["current_uses"] = promo.get("current_uses", 0) + 1
+        return before
+
+    async def release(self, key):
+        promo = self._by_key(key)
+        if promo is not None and promo.get("current_uses", 0) > 0:
+            promo["current_uses"] -= 1
+
+
+class MemoryRollups(RollupRepository):
+    def __init__(self, orders: Dict[str, dict]):
+        self.orders = orders
+        self.rows: Dict[tuple, dict] = {}
+
+    def add(self, order: dict, sign: int):
+        key = (order_day(order["created_at"]), order.get("promocode") or "")
+        row = self.rows.setdefault(key, {"day": key[0], "promocode": key[1],
+                                         "orders": 0, "revenue": 0, "subtotal": 0, "discount": 0})
+        for name, value in rollup_increments(order, sign).items():
+            row[name] += value
+        if row["orders"] <= 0:
+            del self.rows[key]
+
+    async def list(self, start, end):
+        return [
+            dict(self.rows[key]) for key in sorted(self.rows)
+            if (not start or key[0] >= start) and (not end or key[0] <= end)
+        ]
+
+    async def rebuild(self):
+        self.rows.clear()
+        for order in self.orders.values():
+            self.add(order, 1)
+        return len(self.rows)
+
+    async def delete_all(self):
+        count = len(self.rows)
+        self.rows.clear()
+        return count
+
+
+class MemoryOrders(_Collection, OrderRepository):
+    def __init__(self):
+        super().__init__()
+        self.rollups = MemoryRollups(self.docs)
+
+    async def create(self, doc):
+        await super().create(doc)
+        self.rollups.add(doc, 1)
+
+    async def delete(self, order_id):
+        doc = self.docs.pop(order_id, None)
+        if doc is None:
+            return False
+        self.rollups.add(doc, -1)
+        return True
+
+    async def delete_all(self):
+        await self.rollups.delete_all()
+        return await super().delete_all()
+
+    async def list_page(self, limit, after):
+        docs = sorted(self.docs.values(), key=_keyset, reverse=True)
+        if after:
+            docs = [d for d in docs if _keyset(d) < tuple(after)]
+        return copy.deepcopy(docs[:limit + 1])
+
+    async def stream(self, start, end):
+        for doc in sorted(self.docs.values(), key=_keyset):
+            if (not start or doc["created_at"] >= start) and (not end or doc["created_at"] < end):
+                yield copy.deepcopy(doc)
+
+
+class MemoryAbout(AboutRepository):
+    def __init__(self):
+        self.doc: Optional[dict] = None
+
+    async def get(self):
+        return copy.deepcopy(self.doc)
+
+    async def save(self, doc):
+        self.doc = copy.deepcopy(doc)
+
+    async def delete_all(self):
+        count = int(self.doc is not None)
+        self.doc = None
+        return count
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self.products = MemoryProducts()
+        self.categories = MemoryCategories()
+        self.promocodes = MemoryPromocodes()
+        self.orders = MemoryOrders()
+        self.rollups = self.orders.rollups
+        self.about = MemoryAbout()
+
+    async def apply_batch(self, writes: List[BatchWrite]) -> Optional[BatchFailure]:
+        for index, write in enumerate(writes):
+            repo = self.repository(write.collection)
+            try:
+                if write.op == "create":
+                    await repo.create(write.doc)
+                elif write.op == "update":
+                    await repo.update(write.id, write.doc)
+                else:
+                    await repo.delete(write.id)
+            except DuplicateError as e:
+                return BatchFailure([index], f"Duplicate key: {e}", duplicate=True)
+        return None
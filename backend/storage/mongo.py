@@ -0,0 +1,462 @@
+"""MongoDB storage through Motor."""
+import logging
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, InsertOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from .base import (
+    AboutRepository,
+    BatchFailure,
+    BatchWrite,
+    CategoryRepository,
+    DuplicateError,
+    Operation,
+    OrderRepository,
+    ProductRepository,
+    PromocodeRepository,
+    RollupRepository,
+    Storage,
+    order_day,
+    rollup_increments,
+)
+
+logger = logging.getLogger(__name__)
+
+# Indexes every collection needs; ensure_indexes() creates the missing ones at startup
+INDEXES = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at_id"),
+        IndexModel(
+            [("category_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="category_id_created_at_id",
+        ),
+        # Order pricing falls back to name lookup for clients without product_id
+        IndexModel([("name", ASCENDING)], name="name"),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("order", ASCENDING)], name="order"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "promocodes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("code_key", ASCENDING)], name="code_key_unique", unique=True),
+    ],
+    "about": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "daily_rollups": [
+        IndexModel([("day", ASCENDING), ("promocode", ASCENDING)], name="day_promocode_unique", unique=True),
+    ],
+}
+
+ABOUT_ID = "about-us"
+
+
+async def fetch_page(collection, query: dict, direction: int, limit: int, after: Optional[tuple],
+                     fields: Optional[List[str]] = None) -> List[dict]:
+    """Keyset pagination on (created_at, id); returns up to ``limit + 1`` documents."""
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in {*fields, "id", "created_at"}})
+    if after:
+        created_at, doc_id = after
+        op = "$gt" if direction == 1 else "$lt"
+        keyset = {"$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "id": {op: doc_id}},
+        ]}
+        query = {"$and": [query, keyset]} if query else keyset
+    return await (
+        collection.find(query, projection)
+        .sort([("created_at", direction), ("id", direction)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+
+
+class _Collection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def existing_ids(self, ids):
+        if not ids:
+            return set()
+        docs = await self.collection.find({"id": {"$in": list(ids)}}, {"_id": 0, "id": 1}).to_list(None)
+        return {doc["id"] for doc in docs}
+
+    async def create(self, doc):
+        # insert_one adds _id to the dict it is given
+        await self.collection.insert_one(dict(doc))
+
+    async def insert_many(self, docs):
+        if docs:
+            await self.collection.insert_many([dict(doc) for doc in docs])
+
+    async def update(self, doc_id, fields):
+        return await self.collection.find_one_and_update(
+            {"id": doc_id},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def delete(self, doc_id):
+        result = await self.collection.delete_one({"id": doc_id})
+        return result.deleted_count > 0
+
+    async def delete_all(self):
+        result = await self.collection.delete_many({})
+        return result.deleted_count
+
+
+class MongoProducts(_Collection, ProductRepository):
+    async def list_page(self, category_id, limit, after, fields=None):
+        query = {"category_id": category_id} if category_id else {}
+        return await fetch_page(self.collection, query, 1, limit, after, fields)
+
+    async def get(self, product_id):
+        return await self.collection.find_one({"id": product_id}, {"_id": 0})
+
+    async def find_for_pricing(self, ids, names):
+        clauses = []
+        if ids:
+            clauses.append({"id": {"$in": list(ids)}})
+        if names:
+            clauses.append({"name": {"$in": list(names)}})
+        if not clauses:
+            return []
+        return await self.collection.find(
+            {"$or": clauses}, {"_id": 0, "id": 1, "name": 1, "base_price": 1, "weight_prices": 1}
+        ).to_list(None)
+
+    async def find_inline_image_ids(self, after, limit):
+        query = {"image": {"$regex": "^data:"}}
+        if after is not None:
+            query["id"] = {"$gt": after}
+        docs = await (
+            self.collection.find(query, {"_id": 0, "id": 1}).sort("id", ASCENDING).limit(limit).to_list(None)
+        )
+        return [doc["id"] for doc in docs]
+
+
+class MongoCategories(_Collection, CategoryRepository):
+    async def list(self):
+        return await self.collection.find({}, {"_id": 0}).sort("order", 1).to_list(None)
+
+    async def count(self):
+        return await self.collection.count_documents({})
+
+    async def max_order(self):
+        last = await self.collection.find_one(sort=[("order", -1)])
+        return last.get("order", 0) if last else None
+
+    async def reorder(self, category_ids):
+        if category_ids:
+            await self.collection.bulk_write(
+                [UpdateOne({"id": cat_id}, {"$set": {"order": index}}) for index, cat_id in enumerate(category_ids)],
+                ordered=False,
+            )
+
+
+class MongoPromocodes(_Collection, PromocodeRepository):
+    async def list(self):
+        return await self.collection.find({}, {"_id": 0}).to_list(None)
+
+    async def get_by_key(self, key):
+        return await self.collection.find_one({"code_key": key}, {"_id": 0})
+
+    async def create(self, doc):
+        try:
+            await super().create(doc)
+        except DuplicateKeyError as e:
+            raise DuplicateError(doc["code"]) from e
+
+    async def update(self, doc_id, fields):
+        try:
+            return await super().update(doc_id, fields)
+        except DuplicateKeyError as e:
+            raise DuplicateError(fields.get("code")) from e
+
+    async def redeem(self, key):
+        # BEFORE rather than AFTER: the caller needs the discount, not the new count
+        return await self.collection.find_one_and_update(
+            {
+                "code_key": key,
+                "is_active": {"$ne": False},
+                "$expr": {"$lt": ["$current_uses", "$max_uses"]},
+            },
+            {"$inc": {"current_uses": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+
+    async def release(self, key):
+        await self.collection.update_one({"code_key": key, "current_uses": {"$gt": 0}}, {"$inc": {"current_uses": -1}})
+
+    async def backfill_keys(self, normalize) -> int:
+        """Add ``code_key`` to promocodes created before it existed."""
+        updated = 0
+        async for promo in self.collection.find({"code_key": {"$exists": False}}, {"_id": 0, "id": 1, "code": 1}):
+            await self.collection.update_one({"id": promo["id"]}, {"$set": {"code_key": normalize(promo["code"])}})
+            updated += 1
+        return updated
+
+
+class MongoRollups(RollupRepository):
+    def __init__(self, collection, orders):
+        self.collection = collection
+        self.orders = orders
+
+    async def add(self, order: dict, sign: int):
+        key = {"day": order_day(order["created_at"]), "promocode": order.get("promocode") or ""}
+        await self.collection.update_one(key, {"$inc": rollup_increments(order, sign)}, upsert=True)
+        if sign < 0:
+            await self.collection.delete_one({**key, "orders": {"$lte": 0}})
+
+    async def list(self, start, end):
+        day = {}
+        if start:
+            day["$gte"] = start
+        if end:
+            day["$lte"] = end
+        return await (
+            self.collection.find({"day": day} if day else {}, {"_id": 0})
+            .sort([("day", ASCENDING), ("promocode", ASCENDING)])
+            .to_list(None)
+        )
+
+    async def rebuild(self):
+        # created_at is the ISO string the API wrote in UTC, so its first
+        # ten characters are the UTC day. $out swaps the collection in one
+        # step and keeps its indexes.
+        pipeline = [
+            {"$group": {
+                "_id": {"day": {"$substr": ["$created_at", 0, 10]}, "promocode": {"$ifNull": ["$promocode", ""]}},
+                "orders": {"$sum": 1},
+                "revenue": {"$sum": "$total"},
+                "subtotal": {"$sum": "$subtotal"},
+                "discount": {"$sum": {"$ifNull": ["$discount", 0]}},
+            }},
+            {"$project": {
+                "_id": 0, "day": "$_id.day", "promocode": "$_id.promocode",
+                "orders": 1, "revenue": 1, "subtotal": 1, "discount": 1,
+            }},
+            {"$out": self.collection.name},
+        ]
+        await self.orders.aggregate(pipeline).to_list(None)
+        return await self.collection.count_documents({})
+
+    async def delete_all(self):
+        result = await self.collection.delete_many({})
+        return result.deleted_count
+
+
+class MongoOrders(_Collection, OrderRepository):
+    STREAM_BATCH_SIZE = 500
+
+    def __init__(self, collection, rollups_collection):
+        super().__init__(collection)
+        self.rollups = MongoRollups(rollups_collection, collection)
+
+    async def create(self, doc):
+        await super().create(doc)
+        await self._add_to_rollups(doc, 1)
+
+    async def delete(self, order_id):
+        doc = await self.collection.find_one_and_delete({"id": order_id}, projection={"_id": 0})
+        if doc is None:
+            return False
+        await self._add_to_rollups(doc, -1)
+        return True
+
+    async def _add_to_rollups(self, doc, sign):
+        # Not atomic with the order write, which has already happened: failing
+        # here would make the caller retry it. rebuild() repairs the drift.
+        try:
+            await self.rollups.add(doc, sign)
+        except PyMongoError as exc:
+            logger.error("Could not update sales rollups for order %s: %s", doc.get("id"), exc)
+
+    async def delete_all(self):
+        deleted = await super().delete_all()
+        await self.rollups.delete_all()
+        return deleted
+
+    async def list_page(self, limit, after):
+        return await fetch_page(self.collection, {}, -1, limit, after)
+
+    async def stream(self, start, end):
+        created_at = {}
+        if start:
+            created_at["$gte"] = start
+        if end:
+            created_at["$lt"] = end
+        cursor = (
+            self.collection.find({"created_at": created_at} if created_at else {}, {"_id": 0})
+            .sort([("created_at", ASCENDING), ("id", ASCENDING)])
+            .batch_size(self.STREAM_BATCH_SIZE)
+        )
+        try:
+            async for doc in cursor:
+                yield doc
+        finally:
+            await cursor.close()
+
+
+class MongoAbout(AboutRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self):
+        return await self.collection.find_one({"id": ABOUT_ID}, {"_id": 0})
+
+    async def save(self, doc):
+        await self.collection.update_one({"id": ABOUT_ID}, {"$set": {**doc, "id": ABOUT_ID}}, upsert=True)
+
+    async def delete_all(self):
+        result = await self.collection.delete_many({})
+        return result.deleted_count
+
+
+class CommandEvents(monitoring.CommandListener):
+    """Reports every command the driver sends as a storage Operation."""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self.started_commands = {}
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        else:
+            target = event.command.get(event.command_name)
+        target = target if isinstance(target, str) else ""
+        self.started_commands[(event.connection_id, event.request_id)] = (target, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, ok):
+        target, command = self.started_commands.pop((event.connection_id, event.request_id), ("", None))
+        self.storage.emit(Operation(
+            "mongo", event.command_name, target, event.duration_micros / 1e6, ok, command
+        ))
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self, url: str, db_name: str, promocode_key, **client_options):
+        super().__init__()
+        self.client = AsyncIOMotorClient(url, event_listeners=[CommandEvents(self)], **client_options)
+        self.db = self.client[db_name]
+        self.promocode_key = promocode_key
+        self.products = MongoProducts(self.db.products)
+        self.categories = MongoCategories(self.db.categories)
+        self.promocodes = MongoPromocodes(self.db.promocodes)
+        self.orders = MongoOrders(self.db.orders, self.db.daily_rollups)
+        self.rollups = self.orders.rollups
+        self.about = MongoAbout(self.db.about)
+
+    async def prepare(self):
+        try:
+            await self.promocodes.backfill_keys(self.promocode_key)
+            report = await self.ensure_indexes()
+        except PyMongoError as exc:
+            logger.error("Index bootstrap failed: %s", exc)
+            return
+        created = {name: r["created"] for name, r in report.items() if r["created"]}
+        if created:
+            logger.info("Created indexes: %s", created)
+
+    async def index_report(self):
+        return await self.ensure_indexes(create=False)
+
+    async def ensure_indexes(self, create: bool = True) -> dict:
+        """Compare each collection's indexes with INDEXES and create the missing ones.
+
+        Idempotent. Extra or mismatched indexes are only reported, never dropped.
+        """
+        report = {}
+        for name, models in INDEXES.items():
+            collection = self.db[name]
+            existing = await collection.index_information()
+            wanted = {model.document["name"]: model.document for model in models}
+            missing = [n for n in wanted if n not in existing]
+            mismatched = [
+                n for n, spec in wanted.items()
+                if n in existing and (
+                    list(existing[n]["key"]) != list(spec["key"].items())
+                    or bool(existing[n].get("unique")) != bool(spec.get("unique"))
+                )
+            ]
+            extra = sorted(set(existing) - set(wanted) - {"_id_"})
+            created, failed = [], {}
+            if create:
+                for model in models:
+                    index_name = model.document["name"]
+                    if index_name not in missing:
+                        continue
+                    try:
+                        await collection.create_indexes([model])
+                        created.append(index_name)
+                    except PyMongoError as exc:
+                        # e.g. duplicate values blocking a unique index
+                        failed[index_name] = str(exc)
+                        logger.error("Could not create index %s.%s: %s", name, index_name, exc)
+                missing = [n for n in missing if n not in created]
+            if extra or mismatched:
+                logger.warning("Collection %s: extra indexes %s, mismatched %s", name, extra, mismatched)
+            report[name] = {
+                "created": created,
+                "missing": missing,
+                "mismatched": mismatched,
+                "extra": extra,
+                "failed": failed,
+            }
+        return report
+
+    async def apply_batch(self, writes: List[BatchWrite]) -> Optional[BatchFailure]:
+        """Consecutive writes to one collection go out as one ordered bulk_write.
+
+        Writes before a failure stay applied; there is no rollback.
+        """
+        start = 0
+        while start < len(writes):
+            collection = writes[start].collection
+            end = start
+            while end < len(writes) and writes[end].collection == collection:
+                end += 1
+            requests = []
+            for write in writes[start:end]:
+                if write.op == "create":
+                    requests.append(InsertOne(dict(write.doc)))
+                elif write.op == "update":
+                    requests.append(UpdateOne({"id": write.id}, {"$set": write.doc}))
+                else:
+                    requests.append(DeleteOne({"id": write.id}))
+            try:
+                await self.db[collection].bulk_write(requests, ordered=True)
+            except BulkWriteError as e:
+                write_error = e.details["writeErrors"][0]
+                duplicate = write_error.get("code") == 11000
+                return BatchFailure(
+                    [start + write_error["index"]],
+                    write_error.get("errmsg", "Write failed"),
+                    duplicate=duplicate,
+                )
+            start = end
+        return None
+
+    async def close(self):
+        self.client.close()
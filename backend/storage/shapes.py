@@ -0,0 +1,64 @@
+"""Query shapes: statements with their literal values redacted.
+
+Operations that differ only in values (a product id, a promocode) share a
+shape, so they can be grouped in the slow-operation table and logged
+without customer data.
+"""
+import json
+import re
+from typing import Any, Mapping
+
+REDACTED = "?"
+
+# Parts of each MongoDB command that decide how it is executed. Filters are
+# redacted; sort keys and projections name fields only and are kept as is.
+COMMAND_FILTERS = {
+    "find": ("filter",),
+    "count": ("query",),
+    "distinct": ("query",),
+    "findAndModify": ("query",),
+}
+COMMAND_KEPT = ("sort", "projection", "key")
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_VALUES_ROWS = re.compile(r"(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+", re.IGNORECASE)
+_NUMBER = re.compile(r"(?<![\w%])-?\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_SPACE = re.compile(r"\s+")
+
+
+def redact(value: Any) -> Any:
+    """Keep keys and operators, replace every literal with ``?``."""
+    if isinstance(value, Mapping):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Lists of clauses ($or, $and, pipelines) keep their structure;
+        # lists of values ($in) collapse to one placeholder
+        if value and all(isinstance(item, Mapping) for item in value):
+            return [redact(item) for item in value]
+        return REDACTED
+    return REDACTED
+
+
+def command_shape(name: str, command: Mapping) -> str:
+    if name == "aggregate":
+        parts = {"pipeline": redact(command.get("pipeline", []))}
+    elif name in ("update", "delete"):
+        statements = command.get("updates" if name == "update" else "deletes") or [{}]
+        parts = {"q": redact(statements[0].get("q", {}))}
+        if name == "update" and isinstance(statements[0].get("u"), Mapping):
+            # Update operators ($set, $inc) without their values
+            parts["u"] = sorted(statements[0]["u"])
+    else:
+        parts = {key: redact(command[key]) for key in COMMAND_FILTERS.get(name, ()) if key in command}
+        parts.update({key: command[key] for key in COMMAND_KEPT if key in command})
+    return json.dumps(parts, default=str, ensure_ascii=False) if parts else ""
+
+
+def sql_shape(statement: str) -> str:
+    """Parameterized SQL already has no values; collapse placeholder lists and inlined literals."""
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _STRING.sub(REDACTED, shape)
+    shape = _NUMBER.sub(REDACTED, shape)
+    shape = _VALUES_ROWS.sub(r"\1, ...", shape)
+    return _IN_LIST.sub("(%s, ...)", shape)
@@ -0,0 +1,80 @@
+"""
+Backend tests for the admin batch write API
+Tests: Mixed operations, per-operation results, stop on first failure, validation
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+def batch(operations):
+    return requests.post(f"{BASE_URL}/api/admin/batch", json={"operations": operations}, auth=AUTH)
+
+
+class TestAdminBatch:
+    """Test /api/admin/batch"""
+
+    def test_requires_auth(self):
+        response = requests.post(f"{BASE_URL}/api/admin/batch", json={"operations": []})
+        assert response.status_code == 401
+
+    def test_create_update_delete(self):
+        categories = requests.get(f"{BASE_URL}/api/categories").json()
+        response = batch([
+            {"op": "create", "collection": "products", "data": {
+                "name": "TEST_Batch Мёд", "category_id": categories[0]["id"], "base_price": 1000,
+                "weight_prices": [{"weight": "500г", "price": 1000}]}},
+            {"op": "delete", "collection": "products", "id": "no-such-product"},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert [r["status"] for r in data["results"]] == ["created", "not_found"]
+        product_id = data["results"][0]["id"]
+
+        response = batch([
+            {"op": "update", "collection": "products", "id": product_id, "data": {"base_price": 1200}},
+        ])
+        assert response.json()["results"][0]["status"] == "updated"
+        product = requests.get(f"{BASE_URL}/api/products/{product_id}").json()
+        assert product["base_price"] == 1200
+
+        response = batch([{"op": "delete", "collection": "products", "id": product_id}])
+        assert response.json()["results"][0]["status"] == "deleted"
+        assert requests.get(f"{BASE_URL}/api/products/{product_id}").status_code == 404
+        print("✓ Batch create, update and delete applied")
+
+    def test_stops_at_first_failure(self):
+        code = f"TEST{uuid.uuid4().hex[:8].upper()}"
+        promo = {"code": code, "discount_type": "fixed", "discount_value": 100, "max_uses": 1}
+        response = batch([
+            {"op": "create", "collection": "promocodes", "data": promo},
+            {"op": "create", "collection": "promocodes", "data": {**promo, "code": code.lower()}},
+            {"op": "create", "collection": "promocodes", "data": {**promo, "code": code + "X"}},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is False
+        statuses = [r["status"] for r in data["results"]]
+        # MongoDB keeps writes made before the failure, MariaDB rolls the batch back
+        assert statuses[1] == "error"
+        assert statuses[2] in ("skipped", "error")
+        for promo in requests.get(f"{BASE_URL}/api/promocodes", auth=AUTH).json():
+            if promo["code"].upper().startswith(code):
+                requests.delete(f"{BASE_URL}/api/promocodes/{promo['id']}", auth=AUTH)
+
+    def test_invalid_operation_rejected_before_writing(self):
+        response = batch([
+            {"op": "update", "collection": "products", "data": {"base_price": 1}},
+            {"op": "create", "collection": "products", "data": {"name": "TEST_Incomplete"}},
+        ])
+        assert response.status_code == 422
+        assert [e["index"] for e in response.json()["detail"]] == [0, 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,48 @@
+"""
+Unit tests for the content-addressed image store (backend/blob_store.py)
+"""
+import hashlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from blob_store import LocalBlobStore, is_valid_digest, sniff_image_type  # noqa: E402
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 32
+
+
+class TestBlobStore:
+    """Blobs are stored once under their SHA-256 digest"""
+
+    def test_put_is_content_addressed(self, tmp_path):
+        store = LocalBlobStore(tmp_path)
+        digest = store.put(PNG)
+        assert digest == hashlib.sha256(PNG).hexdigest()
+        assert store.exists(digest)
+        assert store.read(digest) == PNG
+        assert store.content_type(digest) == "image/png"
+
+    def test_same_bytes_stored_once(self, tmp_path):
+        store = LocalBlobStore(tmp_path)
+        assert store.put(JPEG) == store.put(JPEG)
+        assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 1
+
+    def test_rejects_malformed_digests(self, tmp_path):
+        store = LocalBlobStore(tmp_path)
+        assert not is_valid_digest("../etc/passwd")
+        assert not store.exists("ab" * 31)
+
+
+class TestSniffImageType:
+    """Only known image formats are accepted"""
+
+    def test_known_formats(self):
+        assert sniff_image_type(PNG) == "image/png"
+        assert sniff_image_type(JPEG) == "image/jpeg"
+        assert sniff_image_type(b"GIF89a....") == "image/gif"
+        assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+
+    def test_unknown_format(self):
+        assert sniff_image_type(b"<svg xmlns=...>") is None
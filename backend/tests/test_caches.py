@@ -0,0 +1,75 @@
+"""
+Tests for the in-process caches (backend/caches.py)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import caches  # noqa: E402
+from caches import CatalogCache  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def load(value):
+    async def loader():
+        return value
+    return loader
+
+
+class TestCatalogCache:
+    """Entries and the ETag version last at most ttl seconds"""
+
+    def test_version_moves_on_after_ttl(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(caches.time, "monotonic", clock)
+        cache = CatalogCache(ttl=30)
+        assert asyncio.run(cache.get_or_load(("about",), load("old"))) == "old"
+
+        clock.now += 29
+        assert cache.current_version() == 0
+        assert asyncio.run(cache.get_or_load(("about",), load("new"))) == "old"
+
+        clock.now += 1
+        assert cache.current_version() == 1
+        assert asyncio.run(cache.get_or_load(("about",), load("new"))) == "new"
+
+    def test_zero_ttl_keeps_version(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(caches.time, "monotonic", clock)
+        cache = CatalogCache(ttl=0)
+        asyncio.run(cache.get_or_load(("about",), load("old")))
+        clock.now += 10 ** 6
+        assert cache.current_version() == 0
+        assert asyncio.run(cache.get_or_load(("about",), load("new"))) == "old"
+
+    def test_load_during_invalidation_not_stored(self):
+        cache = CatalogCache()
+
+        async def loader():
+            cache.invalidate()
+            return "stale"
+
+        assert asyncio.run(cache.get_or_load(("about",), loader)) == "stale"
+        assert asyncio.run(cache.get_or_load(("about",), load("fresh"))) == "fresh"
+
+
+class TestCacheStats:
+    def test_catalog_ttl_reported(self):
+        response = requests.get(f"{BASE_URL}/api/admin/cache-stats", auth=AUTH)
+        assert response.status_code == 200
+        assert response.json()["catalog"]["ttl"] >= 0
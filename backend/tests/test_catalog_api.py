@@ -0,0 +1,121 @@
+"""
+Backend tests for catalog listing performance features
+Tests: Cursor pagination, card view projection, ETag revalidation
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+class TestProductPagination:
+    """Test keyset pagination of the product listing"""
+
+    def test_pages_cover_catalog_without_duplicates(self):
+        """Following X-Next-Cursor returns every product exactly once"""
+        full = requests.get(f"{BASE_URL}/api/products", params={"limit": 500})
+        assert full.status_code == 200
+        expected = [p["id"] for p in full.json()]
+
+        seen = []
+        params = {"limit": 3}
+        while True:
+            response = requests.get(f"{BASE_URL}/api/products", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page) <= 3
+            seen.extend(p["id"] for p in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params = {"limit": 3, "cursor": cursor}
+
+        assert seen == expected
+        print(f"✓ Paged through {len(seen)} products")
+
+    def test_invalid_cursor_rejected(self):
+        """A malformed cursor returns 400"""
+        response = requests.get(f"{BASE_URL}/api/products", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_cursor_with_bad_timestamp_rejected(self):
+        """A cursor whose created_at is not a timestamp returns 400"""
+        cursor = "WyJ4IiwieSJd"  # ["x","y"]
+        for path in ("/api/products", "/api/orders"):
+            response = requests.get(f"{BASE_URL}{path}", params={"cursor": cursor}, auth=AUTH)
+            assert response.status_code == 400, path
+
+    def test_orders_paginated(self):
+        """Orders listing honours limit"""
+        response = requests.get(f"{BASE_URL}/api/orders", params={"limit": 1}, auth=AUTH)
+        assert response.status_code == 200
+        assert len(response.json()) <= 1
+
+
+class TestCardView:
+    """Test the sparse product projection used by the storefront grid"""
+
+    def test_card_view_omits_description(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"view": "card"})
+        assert response.status_code == 200
+        for product in response.json():
+            assert "description" not in product
+            assert {"id", "name", "category_id", "base_price", "image", "weight_prices"} <= set(product)
+
+    def test_fields_parameter(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"fields": "name"})
+        assert response.status_code == 200
+        for product in response.json():
+            assert set(product) == {"id", "name", "created_at"}
+
+    def test_unknown_field_rejected(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"fields": "name,password"})
+        assert response.status_code == 400
+
+
+class TestCatalogETag:
+    """Test conditional GETs on public catalog endpoints"""
+
+    @pytest.mark.parametrize("path", ["/api/categories", "/api/products", "/api/about"])
+    def test_if_none_match_returns_304(self, path):
+        response = requests.get(f"{BASE_URL}{path}")
+        assert response.status_code == 200
+        etag = response.headers.get("ETag")
+        assert etag and not etag.startswith("W/")
+
+        response = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        print(f"✓ {path} revalidated with 304")
+
+    def test_etag_changes_after_admin_write(self):
+        """An admin write that changes the content changes the ETag"""
+        etag = requests.get(f"{BASE_URL}/api/categories").headers["ETag"]
+        ids = [cat["id"] for cat in requests.get(f"{BASE_URL}/api/categories").json()]
+        if len(ids) < 2:
+            pytest.skip("needs two categories")
+        response = requests.post(f"{BASE_URL}/api/categories/reorder", json=ids[::-1], auth=AUTH)
+        assert response.status_code == 200
+        try:
+            response = requests.get(f"{BASE_URL}/api/categories", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+        finally:
+            requests.post(f"{BASE_URL}/api/categories/reorder", json=ids, auth=AUTH)
+
+    def test_etag_survives_write_without_change(self):
+        """The ETag is a hash of the content, so a write that changes nothing keeps it"""
+        etag = requests.get(f"{BASE_URL}/api/categories").headers["ETag"]
+        ids = [cat["id"] for cat in requests.get(f"{BASE_URL}/api/categories").json()]
+        response = requests.post(f"{BASE_URL}/api/categories/reorder", json=ids, auth=AUTH)
+        assert response.status_code == 200
+
+        response = requests.get(f"{BASE_URL}/api/categories", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,77 @@
+"""
+Tests for response compression (backend/compression.py) and compressed catalog responses
+"""
+import asyncio
+import gzip
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from compression import PrecompressedBody, negotiate  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestNegotiation:
+    """Accept-Encoding picks a supported encoding, honouring q-values"""
+
+    def test_gzip_accepted(self):
+        assert negotiate("gzip, deflate") == "gzip"
+        assert negotiate("deflate, gzip;q=0.2") == "gzip"
+        assert negotiate("*") in ("br", "gzip")
+
+    def test_nothing_acceptable(self):
+        assert negotiate(None) is None
+        assert negotiate("identity") is None
+        assert negotiate("gzip;q=0") is None
+
+
+class TestPrecompressedBody:
+    """Compressed forms are computed once and reused"""
+
+    def test_gzip_response_reuses_bytes(self):
+        body = PrecompressedBody(b'{"name":"' + "Мёд ".encode() * 500 + b'"}')
+        first = asyncio.run(body.response("gzip", {"ETag": '"v1"'}))
+        second = asyncio.run(body.response("gzip"))
+        assert first.headers["content-encoding"] == "gzip"
+        assert first.headers["etag"] == '"v1-gzip"'
+        assert "Accept-Encoding" in first.headers["vary"]
+        assert gzip.decompress(first.body) == body.body
+        assert second.body is first.body
+
+    def test_etag_follows_content(self):
+        assert PrecompressedBody(b"[1]").etag == PrecompressedBody(b"[1]").etag
+        assert PrecompressedBody(b"[1]").etag != PrecompressedBody(b"[2]").etag
+        assert PrecompressedBody(b"[1]").etag.startswith('"')
+
+    def test_identity_and_small_bodies(self):
+        body = PrecompressedBody(b"[]")
+        assert "content-encoding" not in asyncio.run(body.response(None)).headers
+        assert "content-encoding" not in asyncio.run(body.response("gzip", minimum_size=1024)).headers
+
+
+class TestCompressedCatalog:
+    """Catalog responses are compressed for clients that accept it"""
+
+    def test_products_gzip(self):
+        plain = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "identity"})
+        assert plain.status_code == 200
+        assert "Content-Encoding" not in plain.headers
+        compressed = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers.get("Content-Encoding") == "gzip"
+        assert int(compressed.headers["Content-Length"]) < len(plain.content)
+        assert compressed.json() == plain.json()
+        print(f"✓ {len(plain.content)} bytes → {compressed.headers['Content-Length']} gzip")
+
+    def test_compressed_etag_revalidates(self):
+        first = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "gzip"})
+        etag = first.headers["ETag"]
+        assert etag.endswith('-gzip"')
+        second = requests.get(
+            f"{BASE_URL}/api/products", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        assert second.status_code == 304
@@ -0,0 +1,71 @@
+"""
+Tests for list-response encoding (backend/fast_json.py)
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+import requests
+from pydantic import BaseModel, ValidationError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fast_json import DocumentList, dumps  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+class Line(BaseModel):
+    name: str
+    price: float
+
+
+class Doc(BaseModel):
+    id: str
+    total: float
+    note: str = ""
+    lines: List[Line] = []
+
+
+class TestDocumentList:
+    """One validation, same JSON as Model(**doc).model_dump()"""
+
+    def test_matches_model_dump(self):
+        docs = [{"id": "a", "total": 10, "lines": [{"name": "Мёд", "price": 5}], "_id": "dropped"}, {"id": "b", "total": 1.5}]
+        body = DocumentList(Doc).encode(docs)
+        assert json.loads(body) == [Doc(**doc).model_dump(mode="json") for doc in docs]
+        assert "Мёд".encode() in body
+
+    def test_invalid_document_raises(self):
+        with pytest.raises(ValidationError):
+            DocumentList(Doc).encode([{"id": "a"}])
+
+    def test_response_headers(self):
+        response = DocumentList(Doc).response([], {"X-Next-Cursor": "abc"})
+        assert response.body == b"[]"
+        assert response.headers["x-next-cursor"] == "abc"
+        assert response.media_type == "application/json"
+
+    def test_dumps_compact_utf8(self):
+        assert dumps({"name": "Мёд", "price": 1.0}) == '{"name":"Мёд","price":1.0}'.encode()
+
+
+class TestListEndpoints:
+    """List endpoints keep their JSON and pagination headers"""
+
+    def test_orders_page(self):
+        response = requests.get(f"{BASE_URL}/api/orders", params={"limit": 1}, auth=AUTH)
+        assert response.status_code == 200
+        orders = response.json()
+        assert len(orders) <= 1
+        if orders:
+            assert {"id", "items", "total", "created_at"} <= set(orders[0])
+
+    def test_promocodes(self):
+        response = requests.get(f"{BASE_URL}/api/promocodes", auth=AUTH)
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
@@ -117,6 +117,15 @@ class TestOrdersWithProducts:
     
     def test_create_order_with_promocode(self):
         """Test creating order with promocode"""
+        # Orders are rejected for unknown promocodes, so make sure TESTPROMO exists
+        response = requests.post(
+            f"{BASE_URL}/api/promocodes",
+            json={"code": "TESTPROMO", "discount_type": "percent", "discount_value": 10, "max_uses": 1000},
+            auth=AUTH
+        )
+        assert response.status_code in (200, 409)
+        created_promo_id = response.json()["id"] if response.status_code == 200 else None
+        
         order_data = {
             "customer_name": "TEST_Промо Покупатель",
             "customer_phone": "+7 (700) 222 33 44",
@@ -136,6 +145,9 @@ class TestOrdersWithProducts:
         assert order["promocode"] == "TESTPROMO"
         assert order["discount"] == 350
         assert order["total"] == 3150
+        
+        if created_promo_id:
+            requests.delete(f"{BASE_URL}/api/promocodes/{created_promo_id}", auth=AUTH)
         print("✓ Order with promocode created successfully")
         return order["id"]
     
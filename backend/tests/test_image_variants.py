@@ -0,0 +1,135 @@
+"""
+Unit tests for image variants: width snapping, the on-disk LRU cache and encode coalescing
+"""
+import asyncio
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import image_variants  # noqa: E402
+from image_variants import (  # noqa: E402
+    DiskLRUCache, UndecodableImage, VariantService, WIDTHS, encode_variant, is_decodable, snap_width,
+)
+
+
+class TestSnapWidth:
+    """Requested widths are snapped to a fixed ladder"""
+
+    def test_snaps_up_to_next_allowed_width(self):
+        assert snap_width(1) == WIDTHS[0]
+        assert snap_width(300) == 320
+        assert snap_width(320) == 320
+
+    def test_caps_at_largest_width(self):
+        assert snap_width(10_000) == WIDTHS[-1]
+
+
+class TestDiskLRUCache:
+    """Variants are cached on disk up to a byte budget"""
+
+    def test_get_returns_cached_bytes(self, tmp_path):
+        cache = DiskLRUCache(tmp_path, max_bytes=1024)
+        cache.put("aa-320.webp", b"variant")
+        assert cache.get("aa-320.webp") == b"variant"
+        assert cache.get("bb-320.webp") is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = DiskLRUCache(tmp_path, max_bytes=250)
+        cache.put("aa-320.webp", b"a" * 100)
+        cache.put("bb-320.webp", b"b" * 100)
+        cache.get("aa-320.webp")
+        cache.put("cc-320.webp", b"c" * 100)
+        assert cache.get("bb-320.webp") is None
+        assert cache.get("aa-320.webp") is not None
+        assert cache.total_bytes <= 250
+
+    def test_index_survives_restart(self, tmp_path):
+        DiskLRUCache(tmp_path, max_bytes=1024).put("aa-320.webp", b"variant")
+        reopened = DiskLRUCache(tmp_path, max_bytes=1024)
+        assert reopened.get("aa-320.webp") == b"variant"
+        assert reopened.total_bytes == len(b"variant")
+
+
+JUNK_PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 2
+
+
+class TestDecoding:
+    """Bytes that only look like an image are refused"""
+
+    def test_junk_with_valid_signature(self):
+        pytest.importorskip("PIL")
+        assert not is_decodable(JUNK_PNG)
+        with pytest.raises(UndecodableImage):
+            encode_variant(JUNK_PNG, 160, "webp")
+
+    def test_real_image(self):
+        Image = pytest.importorskip("PIL.Image")
+        out = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(out, "PNG")
+        assert is_decodable(out.getvalue())
+
+
+class Store:
+    def read(self, digest):
+        return b"source"
+
+
+class TestVariantService:
+    """Concurrent requests for one variant share a single encode"""
+
+    def test_concurrent_misses_encode_once(self, tmp_path, monkeypatch):
+        calls = []
+        lock = threading.Lock()
+
+        def encode(data, width, fmt):
+            with lock:
+                calls.append((width, fmt))
+            time.sleep(0.2)
+            return f"{width}.{fmt}".encode()
+
+        monkeypatch.setattr(image_variants, "encode_variant", encode)
+        service = VariantService(Store(), DiskLRUCache(tmp_path, max_bytes=1024))
+        # Threads instead of processes so the patched encoder is the one that runs
+        service._executor = ThreadPoolExecutor(max_workers=4)
+
+        async def race():
+            return await asyncio.gather(*(service.get("aa", 320, "webp") for _ in range(5)),
+                                        service.get("aa", 160, "webp"))
+
+        results = asyncio.run(race())
+        service.shutdown()
+        assert results == [b"320.webp"] * 5 + [b"160.webp"]
+        assert sorted(calls) == [(160, "webp"), (320, "webp")]
+
+    def test_cached_variant_not_encoded_again(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(image_variants, "encode_variant", lambda data, width, fmt: calls.append(1) or b"v")
+        service = VariantService(Store(), DiskLRUCache(tmp_path, max_bytes=1024))
+        service._executor = ThreadPoolExecutor(max_workers=1)
+        asyncio.run(service.get("aa", 320, "webp"))
+        assert asyncio.run(service.get("aa", 320, "webp")) == b"v"
+        service.shutdown()
+        assert len(calls) == 1
+
+    def test_undecodable_image_not_encoded_again(self, tmp_path, monkeypatch):
+        calls = []
+
+        def encode(data, width, fmt):
+            calls.append(1)
+            raise UndecodableImage("cannot identify image file")
+
+        monkeypatch.setattr(image_variants, "encode_variant", encode)
+        service = VariantService(Store(), DiskLRUCache(tmp_path, max_bytes=1024))
+        service._executor = ThreadPoolExecutor(max_workers=1)
+        for width in (160, 320):
+            with pytest.raises(UndecodableImage):
+                asyncio.run(service.get("aa", width, "webp"))
+        service.shutdown()
+        assert len(calls) == 1
@@ -0,0 +1,180 @@
+"""
+Backend tests for stored images
+Tests: POST /api/images, variant encoding and coalescing, POST /api/images/migrate
+"""
+import base64
+import hashlib
+import importlib
+import io
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import requests
+
+Image = pytest.importorskip("PIL.Image")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+def make_png(width: int = 400, height: int = 300) -> bytes:
+    """A PNG with random pixels, so every call uploads a new image."""
+    pixels = bytes(random.getrandbits(8) for _ in range(width * height * 4))
+    out = io.BytesIO()
+    Image.frombytes("RGBA", (width, height), pixels).save(out, "PNG")
+    return out.getvalue()
+
+
+def upload(data: bytes, name: str = "honey.png"):
+    return requests.post(f"{BASE_URL}/api/images", files={"file": (name, data)}, auth=AUTH)
+
+
+class TestImageUpload:
+    """Uploads are stored under their SHA-256 digest"""
+
+    def test_upload_and_fetch_original(self):
+        data = make_png()
+        response = upload(data)
+        assert response.status_code == 200
+        body = response.json()
+        digest = hashlib.sha256(data).hexdigest()
+        assert body == {"hash": digest, "url": f"/api/images/{digest}", "size": len(data)}
+
+        response = requests.get(f"{BASE_URL}{body['url']}")
+        assert response.status_code == 200
+        assert response.content == data
+        assert response.headers["content-type"] == "image/png"
+        assert "immutable" in response.headers["cache-control"]
+
+        response = requests.get(f"{BASE_URL}{body['url']}", headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304
+
+    def test_same_bytes_same_url(self):
+        data = make_png(32, 32)
+        assert upload(data).json()["url"] == upload(data).json()["url"]
+
+    def test_rejects_non_images(self):
+        response = upload(b"<svg xmlns='http://www.w3.org/2000/svg'/>", "logo.svg")
+        assert response.status_code == 415
+
+    def test_rejects_undecodable_images(self):
+        response = upload(b"\x89PNG\r\n\x1a\n" + os.urandom(512))
+        assert response.status_code == 415
+
+    def test_requires_admin(self):
+        response = requests.post(f"{BASE_URL}/api/images", files={"file": ("honey.png", make_png(8, 8))})
+        assert response.status_code == 401
+
+    def test_unknown_image_404(self):
+        response = requests.get(f"{BASE_URL}/api/images/{'0' * 64}")
+        assert response.status_code == 404
+
+
+class TestImageVariants:
+    """?w= and ?format= return resized, re-encoded variants"""
+
+    @pytest.fixture(scope="class")
+    def image_url(self):
+        response = upload(make_png(400, 300))
+        assert response.status_code == 200
+        return f"{BASE_URL}{response.json()['url']}"
+
+    @pytest.mark.parametrize("fmt,content_type", [("webp", "image/webp"), ("jpeg", "image/jpeg"), ("png", "image/png")])
+    def test_resized_and_encoded(self, image_url, fmt, content_type):
+        response = requests.get(image_url, params={"w": 100, "format": fmt})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == content_type
+        with Image.open(io.BytesIO(response.content)) as variant:
+            assert variant.format == fmt.upper()
+            # 100 is snapped up to the 160 px rung; the aspect ratio is kept
+            assert variant.size == (160, 120)
+        assert response.headers["ETag"].endswith(f'-160.{fmt}"')
+
+    def test_width_only_keeps_source_format(self, image_url):
+        response = requests.get(image_url, params={"w": 320})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+
+    def test_never_upscales(self, image_url):
+        response = requests.get(image_url, params={"w": 1200, "format": "webp"})
+        with Image.open(io.BytesIO(response.content)) as variant:
+            assert variant.size == (400, 300)
+
+    def test_variant_revalidates(self, image_url):
+        etag = requests.get(image_url, params={"w": 160, "format": "webp"}).headers["ETag"]
+        response = requests.get(image_url, params={"w": 160, "format": "webp"}, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+    @pytest.mark.parametrize("params", [{"format": "gif"}, {"w": 0}, {"w": -5}])
+    def test_invalid_variant_rejected(self, image_url, params):
+        assert requests.get(image_url, params=params).status_code == 400
+
+    def test_concurrent_requests_get_one_variant(self):
+        """Requests racing for an uncached variant all get the same encode"""
+        url = f"{BASE_URL}{upload(make_png(640, 480)).json()['url']}"
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(lambda _: requests.get(url, params={"w": 480, "format": "webp"}), range(8)))
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.content for response in responses}) == 1
+
+
+@pytest.fixture(scope="module")
+def local_server(tmp_path_factory):
+    """server.py on the memory backend, for product data the API itself no longer writes."""
+    from fastapi.testclient import TestClient
+
+    root = tmp_path_factory.mktemp("images")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("STORAGE_BACKEND", "memory")
+        patch.setenv("IMAGE_STORE_DIR", str(root / "uploads"))
+        patch.setenv("IMAGE_CACHE_DIR", str(root / "image_cache"))
+        sys.modules.pop("server", None)
+        server = importlib.import_module("server")
+        try:
+            with TestClient(server.app) as client:
+                yield server, client
+        finally:
+            sys.modules.pop("server", None)
+
+
+class TestInlineImageMigration:
+    """POST /api/images/migrate moves data: URLs out of product documents"""
+
+    def test_migrates_data_urls(self, local_server):
+        server, client = local_server
+        data = make_png(16, 16)
+        product = client.post(
+            "/api/products",
+            json={"name": "Мёд", "category_id": "cat-honey", "base_price": 1200},
+            auth=AUTH,
+        ).json()
+        # Stored the way products were before uploads went to the image store
+        inline = "data:image/png;base64," + base64.b64encode(data).decode()
+        client.portal.call(server.storage.products.update, product["id"], {"image": inline})
+        broken = client.post(
+            "/api/products",
+            json={"name": "Перга", "category_id": "cat-bee", "base_price": 2500},
+            auth=AUTH,
+        ).json()
+        client.portal.call(server.storage.products.update, broken["id"], {"image": "data:image/png;base64,!!"})
+
+        response = client.post("/api/images/migrate", auth=AUTH)
+        assert response.status_code == 200
+        assert response.json() == {"migrated": 1, "skipped": [broken["id"]]}
+
+        image = client.get(f"/api/products/{product['id']}").json()["image"]
+        assert image == f"/api/images/{hashlib.sha256(data).hexdigest()}"
+        assert client.get(image).content == data
+
+        # Nothing left to move the second time
+        assert client.post("/api/images/migrate", auth=AUTH).json()["migrated"] == 0
+
+    def test_requires_admin(self, local_server):
+        _, client = local_server
+        assert client.post("/api/images/migrate").status_code == 401
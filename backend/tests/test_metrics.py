@@ -0,0 +1,93 @@
+"""
+Tests for the Prometheus metrics (backend/metrics.py), the /metrics endpoint
+and the Server-Timing header (backend/server_timing.py)
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from metrics import Registry  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestRegistry:
+    """Metrics render in the Prometheus text format"""
+
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        counter = registry.counter("jobs_total", "Jobs", ("kind",))
+        gauge = registry.gauge("jobs_running", "Running jobs")
+        counter.inc(kind="a")
+        counter.inc(2, kind='say "hi"')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        text = registry.render()
+        assert "# TYPE jobs_total counter" in text
+        assert 'jobs_total{kind="a"} 1' in text
+        assert 'jobs_total{kind="say \\"hi\\""} 2' in text
+        assert "jobs_running 1" in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value, route="/x")
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/x",le="1.0"} 3' in lines
+        assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{route="/x"} 4' in lines
+        assert 'latency_seconds_sum{route="/x"} 6.05' in lines
+
+    def test_labels_must_match(self):
+        counter = Registry().counter("jobs_total", "Jobs", ("kind",))
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+
+
+class TestMetricsEndpoint:
+    """GET /metrics reports requests per route template"""
+
+    def test_route_templates_and_status(self):
+        products = requests.get(f"{BASE_URL}/api/products", params={"limit": 1}).json()
+        assert products
+        requests.get(f"{BASE_URL}/api/products/{products[0]['id']}")
+        requests.get(f"{BASE_URL}/api/products/does-not-exist")
+
+        response = requests.get(f"{BASE_URL}/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert 'http_requests_total{method="GET",route="/api/products/{product_id}",status="200"}' in text
+        assert 'http_requests_total{method="GET",route="/api/products/{product_id}",status="404"}' in text
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/api/products",le="+Inf"}' in text
+        # Raw ids never become label values
+        assert products[0]["id"] not in text
+        print("✓ Metrics use route templates")
+
+
+class TestServerTiming:
+    """Responses break their time down in a Server-Timing header"""
+
+    def test_phases_present(self):
+        response = requests.get(f"{BASE_URL}/api/categories")
+        assert response.status_code == 200
+        header = response.headers.get("Server-Timing", "")
+        names = [entry.split(";")[0].strip() for entry in header.split(",")]
+        assert names == ["validate", "db", "app", "serialize", "total"]
+        assert 'desc="round trips: ' in header
+        print(f"✓ Server-Timing: {header}")
+
+    def test_rejected_request_has_no_app_phase(self):
+        response = requests.put(f"{BASE_URL}/api/about", json={})
+        assert response.status_code == 401
+        header = response.headers.get("Server-Timing", "")
+        assert header.startswith("validate;dur=")
+        assert "app;" not in header
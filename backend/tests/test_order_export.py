@@ -0,0 +1,114 @@
+"""
+Tests for the order export (backend/order_export.py) and GET /api/orders/export
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from order_export import COLUMNS, csv_chunks, ndjson_chunks, parse_bound  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+ORDER = {
+    "id": "o1",
+    "created_at": "2024-03-01T10:00:00+00:00",
+    "customer_name": "Иван",
+    "customer_phone": "+79001234567",
+    "items": [
+        {"name": "Мёд Гречишный", "weight": "500гр", "price": 1200.0, "quantity": 2, "product_id": "p1"},
+        {"name": "Свечи восковые", "weight": None, "price": 1500.0, "quantity": 1, "product_id": "p2"},
+    ],
+    "subtotal": 3900.0,
+    "discount": 0.0,
+    "total": 3900.0,
+    "promocode": None,
+}
+
+
+async def orders(*docs):
+    for doc in docs:
+        yield doc
+
+
+def collect(chunks) -> bytes:
+    async def read():
+        return b"".join([chunk async for chunk in chunks])
+    return asyncio.run(read())
+
+
+class TestExportFormat:
+    """One row per line item, in either format"""
+
+    def test_csv_rows(self):
+        text = collect(csv_chunks(orders(ORDER))).decode("utf-8-sig")
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert list(rows[0]) == COLUMNS
+        assert [(r["order_id"], r["name"], r["line_total"]) for r in rows] == [
+            ("o1", "Мёд Гречишный", "2400.0"),
+            ("o1", "Свечи восковые", "1500.0"),
+        ]
+
+    def test_csv_formulas_neutralised(self):
+        order = {**ORDER, "customer_name": '=HYPERLINK("http://x")', "customer_phone": "+79001234567",
+                 "items": [{**ORDER["items"][0], "name": "@SUM(A1)"}]}
+        text = collect(csv_chunks(orders(order))).decode("utf-8-sig")
+        row = next(csv.DictReader(io.StringIO(text)))
+        assert row["customer_name"] == "'=HYPERLINK(\"http://x\")"
+        assert row["customer_phone"] == "'+79001234567"
+        assert row["name"] == "'@SUM(A1)"
+        assert row["price"] == "1200.0"
+        ndjson = json.loads(collect(ndjson_chunks(orders(order))).splitlines()[0])
+        assert ndjson["customer_name"] == '=HYPERLINK("http://x")'
+
+    def test_ndjson_rows(self):
+        lines = collect(ndjson_chunks(orders(ORDER, {**ORDER, "id": "o2"}))).splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [r["order_id"] for r in rows] == ["o1", "o1", "o2", "o2"]
+        assert rows[0]["customer_name"] == "Иван" and rows[0]["quantity"] == 2
+
+    def test_bounds(self):
+        assert parse_bound("2024-03-01") == "2024-03-01T00:00:00+00:00"
+        assert parse_bound("2024-03-01", end=True) == "2024-03-02T00:00:00+00:00"
+        assert parse_bound("2024-03-01T12:00:00+03:00") == "2024-03-01T09:00:00+00:00"
+        assert parse_bound(None) is None
+        with pytest.raises(ValueError):
+            parse_bound("March")
+
+
+class TestExportEndpoint:
+    """The export streams for the admin only"""
+
+    def test_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/orders/export")
+        assert response.status_code == 401
+
+    def test_csv_matches_orders(self):
+        orders = requests.get(f"{BASE_URL}/api/orders", params={"limit": 500}, auth=AUTH).json()
+        response = requests.get(f"{BASE_URL}/api/orders/export", params={"format": "csv"}, auth=AUTH)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+        if len(orders) < 500:
+            assert len(rows) == sum(max(len(o["items"]), 1) for o in orders)
+
+    def test_ndjson_date_range(self):
+        response = requests.get(
+            f"{BASE_URL}/api/orders/export", params={"format": "ndjson", "from": "2000-01-01", "to": "2000-01-02"}, auth=AUTH
+        )
+        assert response.status_code == 200
+        assert response.content == b""
+
+    def test_invalid_bounds(self):
+        response = requests.get(f"{BASE_URL}/api/orders/export", params={"from": "yesterday"}, auth=AUTH)
+        assert response.status_code == 400
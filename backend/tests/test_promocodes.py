@@ -0,0 +1,101 @@
+"""
+Backend tests for promocode lookup and redemption
+Tests: Case-insensitive validation, limits enforced under parallel checkout
+"""
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+@pytest.fixture
+def limited_promocode():
+    """A fresh promocode with max_uses=3, deleted after the test"""
+    code = f"TEST{uuid.uuid4().hex[:8].upper()}"
+    response = requests.post(
+        f"{BASE_URL}/api/promocodes",
+        json={"code": code, "discount_type": "percent", "discount_value": 10, "max_uses": 3},
+        auth=AUTH
+    )
+    assert response.status_code == 200
+    promo = response.json()
+    yield promo
+    requests.delete(f"{BASE_URL}/api/promocodes/{promo['id']}", auth=AUTH)
+
+
+def place_order(code):
+    order_data = {
+        "customer_name": "TEST_Промо Гонка",
+        "customer_phone": "+7 (700) 333 44 55",
+        "items": [{"name": "Мёд Гречишный", "weight": "1кг", "price": 3500, "quantity": 1}],
+        "subtotal": 3500,
+        "discount": 350,
+        "total": 3150,
+        "promocode": code
+    }
+    return requests.post(f"{BASE_URL}/api/orders", json=order_data)
+
+
+class TestPromocodeLookup:
+    """Test normalized promocode lookup"""
+
+    def test_validate_is_case_insensitive(self, limited_promocode):
+        code = limited_promocode["code"]
+        for variant in (code, code.lower(), f"  {code.capitalize()} "):
+            response = requests.post(
+                f"{BASE_URL}/api/promocodes/validate",
+                json={"code": variant, "subtotal": 1000}
+            )
+            assert response.status_code == 200
+            assert response.json()["discount"] == 100
+        print("✓ Promocode validated regardless of case")
+
+    def test_duplicate_code_rejected(self, limited_promocode):
+        response = requests.post(
+            f"{BASE_URL}/api/promocodes",
+            json={"code": limited_promocode["code"].lower(), "discount_type": "fixed",
+                  "discount_value": 100, "max_uses": 1},
+            auth=AUTH
+        )
+        assert response.status_code == 409
+
+
+class TestPromocodeRedemption:
+    """Test that max_uses holds under concurrent orders"""
+
+    def test_parallel_orders_do_not_over_redeem(self, limited_promocode):
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: place_order(limited_promocode["code"]), range(10)))
+
+        statuses = sorted(r.status_code for r in responses)
+        assert statuses.count(200) == 3, statuses
+        assert statuses.count(400) == 7, statuses
+
+        promos = requests.get(f"{BASE_URL}/api/promocodes", auth=AUTH).json()
+        promo = next(p for p in promos if p["id"] == limited_promocode["id"])
+        assert promo["current_uses"] == 3
+        print("✓ Only max_uses orders accepted out of 10 parallel checkouts")
+
+    def test_unknown_code_rejected(self):
+        response = place_order("NO_SUCH_CODE_EVER")
+        assert response.status_code == 404
+
+
+class TestCleanup:
+    """Cleanup test data"""
+
+    def test_cleanup_test_orders(self):
+        response = requests.get(f"{BASE_URL}/api/orders", params={"limit": 500}, auth=AUTH)
+        if response.status_code == 200:
+            for order in response.json():
+                if order["customer_name"].startswith("TEST_"):
+                    requests.delete(f"{BASE_URL}/api/orders/{order['id']}", auth=AUTH)
+        print("✓ Test orders cleaned up")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
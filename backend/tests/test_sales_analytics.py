@@ -0,0 +1,164 @@
+"""
+Tests for sales analytics (backend/sales_analytics.py) and GET /api/analytics/sales
+"""
+import asyncio
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sales_analytics import DEFAULT_DAYS, MAX_BUCKETS, default_bounds, summarize  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+def row(day, orders, revenue, promocode="", discount=0.0):
+    return {"day": day, "promocode": promocode, "orders": orders, "revenue": revenue,
+            "subtotal": revenue + discount, "discount": discount}
+
+
+class TestSummarize:
+    """Daily rows are grouped into periods"""
+
+    def test_weeks_start_on_monday(self):
+        rows = [row("2024-03-03", 1, 1000), row("2024-03-04", 2, 3000), row("2024-03-10", 1, 500, "HONEY", 50)]
+        result = summarize(rows, "week")
+        assert [b["start"] for b in result["buckets"]] == ["2024-02-26", "2024-03-04"]
+        week = result["buckets"][1]
+        assert week["orders"] == 3 and week["revenue"] == 3500 and week["average_basket"] == 1166.67
+        assert week["promocode_orders"] == 1
+        assert week["promocodes"] == [{"code": "HONEY", "orders": 1, "discount": 50}]
+        assert result["totals"]["orders"] == 4
+
+    def test_gaps_filled_within_range(self):
+        result = summarize([row("2024-02-10", 1, 100)], "month", date(2024, 1, 15), date(2024, 3, 1))
+        assert [(b["start"], b["orders"]) for b in result["buckets"]] == [
+            ("2024-01-01", 0), ("2024-02-01", 1), ("2024-03-01", 0),
+        ]
+        assert result["buckets"][0]["average_basket"] == 0.0
+
+    def test_range_ending_at_date_max(self):
+        result = summarize([], "month", date(9999, 1, 1), date.max)
+        assert [b["start"] for b in result["buckets"]][-1] == "9999-12-01"
+        assert len(summarize([], "day", date(9999, 12, 30), date.max)["buckets"]) == 2
+
+    def test_too_many_buckets(self):
+        with pytest.raises(ValueError):
+            summarize([], "day", date(1900, 1, 1), date(2100, 1, 1))
+        with pytest.raises(ValueError):
+            summarize([], "month", date(2020, 1, 1), date.max)
+        last = date(2024, 1, 1) + timedelta(weeks=MAX_BUCKETS - 1)
+        assert len(summarize([], "week", date(2024, 1, 1), last)["buckets"]) == MAX_BUCKETS
+
+    def test_data_span_not_capped(self):
+        rows = [row("2020-01-01", 1, 100), row("2024-01-01", 1, 200)]
+        days = (date(2024, 1, 1) - date(2020, 1, 1)).days + 1
+        assert days > MAX_BUCKETS
+        assert len(summarize(rows, "day")["buckets"]) == days
+
+
+class TestDefaultBounds:
+    def test_last_days_up_to_today(self):
+        today = date(2024, 6, 30)
+        assert default_bounds(None, None, today) == (today - timedelta(days=DEFAULT_DAYS - 1), today)
+
+    def test_given_bounds_kept(self):
+        start, end = date(2024, 1, 1), date(2024, 2, 1)
+        assert default_bounds(start, end, date(2024, 6, 30)) == (start, end)
+        assert default_bounds(None, end, date(2024, 6, 30))[1] == end
+        assert default_bounds(start, None, date(2024, 6, 30)) == (start, date(2024, 6, 30))
+
+    def test_start_clamped_at_date_min(self):
+        assert default_bounds(None, date(1, 1, 5), date(2024, 6, 30)) == (date.min, date(1, 1, 5))
+
+
+class FailingRollups:
+    async def add(self, order, sign):
+        from pymongo.errors import AutoReconnect
+        raise AutoReconnect("rollups unavailable")
+
+
+class FakeOrders:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = doc
+
+    async def find_one_and_delete(self, query, projection=None):
+        return self.docs.pop(query["id"], None)
+
+
+class TestMongoRollupFailure:
+    """The order write stands when the rollup update after it fails"""
+
+    def test_create_and_delete_survive(self):
+        mongo = pytest.importorskip("storage.mongo")
+        orders = mongo.MongoOrders(FakeOrders(), None)
+        orders.rollups = FailingRollups()
+        order = {"id": "order-1", "created_at": "2024-03-04T10:00:00+00:00", "total": 100}
+        asyncio.run(orders.create(order))
+        assert "order-1" in orders.collection.docs
+        assert asyncio.run(orders.delete("order-1")) is True
+        assert orders.collection.docs == {}
+
+
+class TestSalesEndpoint:
+    """Rollups follow orders as they are created"""
+
+    def test_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/analytics/sales")
+        assert response.status_code == 401
+
+    def test_new_order_counted_today(self):
+        today = datetime.now(timezone.utc).date().isoformat()
+        params = {"period": "day", "from": today, "to": today}
+
+        def today_orders():
+            response = requests.get(f"{BASE_URL}/api/analytics/sales", params=params, auth=AUTH)
+            assert response.status_code == 200
+            return response.json()["totals"]
+
+        before = today_orders()
+        order = requests.post(f"{BASE_URL}/api/orders", json={
+            "customer_name": "TEST_Аналитика",
+            "customer_phone": "+7 (700) 000 00 01",
+            "items": [{"name": "Мёд Гречишный", "weight": "1кг", "price": 3500, "quantity": 1}],
+        })
+        assert order.status_code == 200
+        after = today_orders()
+        assert after["orders"] == before["orders"] + 1
+        assert round(after["revenue"] - before["revenue"], 2) == order.json()["total"]
+
+        requests.delete(f"{BASE_URL}/api/orders/{order.json()['id']}", auth=AUTH)
+        assert today_orders()["orders"] == before["orders"]
+
+    def test_rebuild_matches_incremental(self):
+        incremental = requests.get(f"{BASE_URL}/api/analytics/sales", auth=AUTH).json()
+        response = requests.post(f"{BASE_URL}/api/admin/rollups/rebuild", auth=AUTH)
+        assert response.status_code == 200
+        rebuilt = requests.get(f"{BASE_URL}/api/analytics/sales", auth=AUTH).json()
+        assert rebuilt["totals"] == incremental["totals"]
+
+    def test_default_is_last_days(self):
+        response = requests.get(f"{BASE_URL}/api/analytics/sales", auth=AUTH)
+        assert response.status_code == 200
+        buckets = response.json()["buckets"]
+        assert len(buckets) == DEFAULT_DAYS
+        assert buckets[-1]["start"] == datetime.now(timezone.utc).date().isoformat()
+
+    def test_oversized_range_rejected(self):
+        for params in ({"period": "month", "from": "2020-01-01", "to": "9999-12-31"},
+                       {"period": "day", "from": "1900-01-01", "to": "2100-01-01"}):
+            response = requests.get(f"{BASE_URL}/api/analytics/sales", params=params, auth=AUTH)
+            assert response.status_code == 400
+
+    def test_invalid_period(self):
+        response = requests.get(f"{BASE_URL}/api/analytics/sales", params={"period": "year"}, auth=AUTH)
+        assert response.status_code == 422
@@ -0,0 +1,88 @@
+"""
+Tests for query shapes (backend/storage/shapes.py), the slow-operation log
+(backend/slow_operations.py) and GET /api/admin/slow-operations
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from slow_operations import SlowOperationLog  # noqa: E402
+from storage import Operation  # noqa: E402
+from storage.shapes import command_shape, sql_shape  # noqa: E402
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+AUTH = ("armanuha", "secretboost1")
+
+
+class TestShapes:
+    """Shapes keep structure and drop values"""
+
+    def test_mongo_filter_values_redacted(self):
+        command = {
+            "find": "products",
+            "filter": {"category_id": "cat-honey", "$or": [{"id": {"$in": ["a", "b"]}}, {"name": "Мёд"}]},
+            "sort": {"created_at": 1},
+        }
+        shape = json.loads(command_shape("find", command))
+        assert shape == {
+            "filter": {"category_id": "?", "$or": [{"id": {"$in": "?"}}, {"name": "?"}]},
+            "sort": {"created_at": 1},
+        }
+
+    def test_same_shape_for_different_values(self):
+        first = {"findAndModify": "promocodes", "query": {"code_key": "HONEY"}}
+        second = {"findAndModify": "promocodes", "query": {"code_key": "SECRET10"}}
+        assert command_shape("findAndModify", first) == command_shape("findAndModify", second)
+        assert "HONEY" not in command_shape("findAndModify", first)
+
+    def test_sql_lists_and_literals_collapse(self):
+        assert sql_shape("SELECT * FROM weight_prices\n  WHERE product_id IN (%s, %s, %s)") == (
+            "SELECT * FROM weight_prices WHERE product_id IN (%s, ...)"
+        )
+        assert sql_shape("INSERT INTO t (a, b) VALUES ('x', 1), ('y', 2)") == "INSERT INTO t (a, b) VALUES (?, ?), ..."
+
+
+class TestSlowOperationLog:
+    """Operations are grouped by shape and ranked"""
+
+    def test_groups_and_ranks(self):
+        log = SlowOperationLog(threshold=0.05)
+        for duration in (0.01, 0.02):
+            log(Operation("mariadb", "SELECT", "products", duration, True, "SELECT * FROM products WHERE id=%s"))
+        log(Operation("mariadb", "SELECT", "orders", 0.2, True, "SELECT * FROM orders"))
+        top = log.top(10)
+        assert [row["target"] for row in top] == ["orders", "products"]
+        assert top[1]["count"] == 2 and top[1]["max_ms"] == 20.0
+        assert log.slow_count == 1
+        assert [row["target"] for row in log.top(10, "count")][0] == "products"
+
+    def test_table_is_bounded(self):
+        log = SlowOperationLog(threshold=1, max_shapes=2)
+        for n, duration in enumerate((0.3, 0.1, 0.2)):
+            log(Operation("mariadb", "SELECT", f"t{n}", duration, True, f"SELECT * FROM t{n}"))
+        assert sorted(row["target"] for row in log.top(10)) == ["t0", "t2"]
+
+
+class TestSlowOperationsEndpoint:
+    """The slowest shapes are readable by the admin only"""
+
+    def test_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/admin/slow-operations")
+        assert response.status_code == 401
+
+    def test_lists_and_resets(self):
+        response = requests.get(f"{BASE_URL}/api/admin/slow-operations", params={"order": "total"}, auth=AUTH)
+        assert response.status_code == 200
+        data = response.json()
+        assert {"storage", "threshold_ms", "slow_count", "operations"} <= set(data)
+        assert isinstance(data["operations"], list)
+
+        response = requests.delete(f"{BASE_URL}/api/admin/slow-operations", auth=AUTH)
+        assert response.status_code == 200
+        data = requests.get(f"{BASE_URL}/api/admin/slow-operations", auth=AUTH).json()
+        assert data["slow_count"] == 0
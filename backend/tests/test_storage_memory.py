@@ -0,0 +1,125 @@
+"""
+Unit tests for the in-memory storage backend (backend/storage/memory.py)
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from storage import BatchWrite, DuplicateError, create_storage  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_storage():
+    return create_storage("memory", {}, lambda code: code.strip().upper())
+
+
+def product(n, category_id="cat-honey"):
+    return {
+        "id": f"p{n:02d}",
+        "name": f"Product {n}",
+        "category_id": category_id,
+        "base_price": 100 * n,
+        "weight_prices": [],
+        "created_at": f"2024-01-01T00:00:{n:02d}+00:00",
+    }
+
+
+def promocode(code, max_uses=1):
+    return {"id": code.lower(), "code": code, "code_key": code, "discount_percent": 10,
+            "max_uses": max_uses, "current_uses": 0, "is_active": True}
+
+
+class TestMemoryStorage:
+    """The memory backend honours the repository contracts"""
+
+    def test_product_pages_follow_keyset(self):
+        storage = make_storage()
+        run(storage.products.insert_many([product(n) for n in range(5)]))
+        first = run(storage.products.list_page(None, 2, None))
+        assert [p["id"] for p in first] == ["p00", "p01", "p02"]
+        after = (first[1]["created_at"], first[1]["id"])
+        second = run(storage.products.list_page(None, 2, after))
+        assert [p["id"] for p in second] == ["p02", "p03", "p04"]
+
+    def test_fields_and_category_filter(self):
+        storage = make_storage()
+        run(storage.products.insert_many([product(1), product(2, "cat-bee")]))
+        docs = run(storage.products.list_page("cat-bee", 10, None, ["name"]))
+        assert docs == [{"id": "p02", "name": "Product 2", "created_at": product(2)["created_at"]}]
+
+    def test_returned_documents_are_copies(self):
+        storage = make_storage()
+        run(storage.products.create(product(1)))
+        run(storage.products.get("p01"))["name"] = "changed"
+        assert run(storage.products.get("p01"))["name"] == "Product 1"
+
+    def test_inline_image_ids_in_batches(self):
+        storage = make_storage()
+        docs = [{**product(n), "image": "data:image/png;base64,AA==" if n % 2 else "/api/images/x"} for n in range(6)]
+        run(storage.products.insert_many(docs))
+        assert run(storage.products.find_inline_image_ids(None, 2)) == ["p01", "p03"]
+        assert run(storage.products.find_inline_image_ids("p03", 2)) == ["p05"]
+        assert run(storage.products.find_inline_image_ids("p05", 2)) == []
+
+    def test_orders_newest_first(self):
+        storage = make_storage()
+        for n in range(3):
+            run(storage.orders.create({"id": f"o{n}", "created_at": f"2024-01-0{n + 1}T00:00:00+00:00"}))
+        assert [o["id"] for o in run(storage.orders.list_page(10, None))] == ["o2", "o1", "o0"]
+
+    def test_order_stream_range(self):
+        storage = make_storage()
+        for n in range(4):
+            run(storage.orders.create({"id": f"o{n}", "created_at": f"2024-01-0{n + 1}T00:00:00+00:00"}))
+
+        async def collect():
+            return [o["id"] async for o in storage.orders.stream("2024-01-02", "2024-01-04")]
+        assert run(collect()) == ["o1", "o2"]
+
+    def test_rollups_follow_orders(self):
+        storage = make_storage()
+        orders = [
+            {"id": "o1", "created_at": "2024-01-01T10:00:00+00:00", "subtotal": 100, "discount": 10, "total": 90,
+             "promocode": "HONEY"},
+            {"id": "o2", "created_at": "2024-01-01T23:00:00+00:00", "subtotal": 50, "discount": 0, "total": 50,
+             "promocode": None},
+        ]
+        for order in orders:
+            run(storage.orders.create(order))
+        rows = run(storage.rollups.list("2024-01-01", "2024-01-01"))
+        assert [(r["promocode"], r["orders"], r["revenue"]) for r in rows] == [("", 1, 50), ("HONEY", 1, 90)]
+        run(storage.orders.delete("o1"))
+        assert [r["promocode"] for r in run(storage.rollups.list(None, None))] == [""]
+        run(storage.rollups.delete_all())
+        assert run(storage.rollups.rebuild()) == 1
+
+    def test_redeem_stops_at_max_uses(self):
+        storage = make_storage()
+        run(storage.promocodes.create(promocode("HONEY", max_uses=1)))
+        assert run(storage.promocodes.redeem("HONEY"))["current_uses"] == 0
+        assert run(storage.promocodes.redeem("HONEY")) is None
+        run(storage.promocodes.release("HONEY"))
+        assert run(storage.promocodes.redeem("HONEY")) is not None
+
+    def test_duplicate_code_rejected(self):
+        storage = make_storage()
+        run(storage.promocodes.create(promocode("HONEY")))
+        with pytest.raises(DuplicateError):
+            run(storage.promocodes.create({**promocode("HONEY"), "id": "other"}))
+
+    def test_batch_stops_at_duplicate(self):
+        storage = make_storage()
+        failure = run(storage.apply_batch([
+            BatchWrite("promocodes", "create", "a", promocode("A")),
+            BatchWrite("promocodes", "create", "b", {**promocode("A"), "id": "b"}),
+            BatchWrite("promocodes", "create", "c", promocode("C")),
+        ]))
+        assert failure.indexes == [1] and failure.duplicate
+        assert {p["id"] for p in run(storage.promocodes.list())} == {"a"}
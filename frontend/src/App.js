@@ -7,6 +7,7 @@ import { toast } from "sonner";
 import HomePage from "@/pages/HomePage";
 import AdminPage from "@/pages/AdminPage";
 import PrivacyPage from "@/pages/PrivacyPage";
+import { fetchAllPages } from "@/lib/utils";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 export const API = `${BACKEND_URL}/api`;
@@ -36,12 +37,12 @@ function App() {
       // Seed data first
       await axios.post(`${API}/seed`);
       
-      const [catRes, prodRes] = await Promise.all([
+      const [catRes, productList] = await Promise.all([
         axios.get(`${API}/categories`),
-        axios.get(`${API}/products`)
+        fetchAllPages(`${API}/products`, { params: { view: "card" } })
       ]);
       setCategories(catRes.data);
-      setProducts(prodRes.data);
+      setProducts(productList);
     } catch (e) {
       console.error("Error fetching data:", e);
       toast.error("Ошибка загрузки данных");
@@ -8,6 +8,7 @@ import { FaShoppingCart, FaTimes, FaPlus, FaMinus, FaWhatsapp, FaTelegramPlane,
 import { GiHoneycomb } from "react-icons/gi";
 import { toast } from "sonner";
 import axios from "axios";
+import { imageSrc } from "@/lib/utils";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -187,6 +188,7 @@ const CartDrawer = ({ isOpen, onClose }) => {
         customer_name: customerName,
         customer_phone: customerPhone,
         items: cart.map(item => ({
+          product_id: item.productId,
           name: item.name,
           weight: item.weight || null,
           price: item.price,
@@ -328,7 +330,7 @@ const CartDrawer = ({ isOpen, onClose }) => {
                   data-testid={`cart-item-${item.id}`}
                 >
                   <img
-                    src={item.image}
+                    src={imageSrc(item.image, 160)}
                     alt={item.name}
                     className="w-14 h-14 md:w-16 md:h-16 object-cover rounded-lg flex-shrink-0"
                   />
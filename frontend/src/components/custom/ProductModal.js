@@ -1,9 +1,11 @@
 import { useState, useEffect } from "react";
-import { useCart } from "@/App";
+import { useCart, API } from "@/App";
 import { Dialog, DialogContent, DialogTitle, DialogDescription } from "@/components/ui/dialog";
 import { VisuallyHidden } from "@radix-ui/react-visually-hidden";
 import { Button } from "@/components/ui/button";
 import { FaTimes, FaShoppingCart } from "react-icons/fa";
+import { imageSrc } from "@/lib/utils";
+import axios from "axios";
 
 const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
   const { addToCart } = useCart();
@@ -17,8 +19,22 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
     }
   }, [product]);
 
+  // The catalog grid is loaded with view=card (no description), so fetch the
+  // full product when the modal opens
+  const [details, setDetails] = useState(null);
+  useEffect(() => {
+    setDetails(null);
+    if (product && product.description === undefined) {
+      axios.get(`${API}/products/${product.id}`)
+        .then(response => setDetails(response.data))
+        .catch(error => console.error("Error fetching product:", error));
+    }
+  }, [product]);
+
   if (!product) return null;
 
+  const description = details?.description ?? product.description;
+
   const hasWeights = product.weight_prices && product.weight_prices.length > 0;
   const currentPrice = selectedWeight?.price || product.base_price;
 
@@ -33,7 +49,7 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
       <DialogContent className="max-w-4xl p-0 overflow-hidden bg-white border-0 shadow-2xl max-h-[95vh] md:max-h-[90vh] flex flex-col">
         <VisuallyHidden>
           <DialogTitle>{product?.name || "Товар"}</DialogTitle>
-          <DialogDescription>{product?.description || "Описание товара"}</DialogDescription>
+          <DialogDescription>{description || "Описание товара"}</DialogDescription>
         </VisuallyHidden>
         
         {/* Close Button */}
@@ -52,7 +68,7 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
             {/* Compact Header with Image */}
             <div className="flex gap-3 mb-4">
               <img
-                src={product.image}
+                src={imageSrc(product.image, 160)}
                 alt={product.name}
                 className="w-20 h-20 object-cover rounded-xl flex-shrink-0"
               />
@@ -69,11 +85,11 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
             </div>
 
             {/* Description - Scrollable for elderly-friendly reading */}
-            {product.description && (
+            {description && (
               <div className="mb-4 bg-gradient-to-b from-amber-50/80 to-amber-50/40 rounded-xl border border-amber-200/50 overflow-hidden">
                 <div className="max-h-24 overflow-y-auto overscroll-contain p-3 scrollbar-thin scrollbar-thumb-amber-300 scrollbar-track-transparent">
                   <p className="text-foreground text-base leading-relaxed font-medium" style={{ fontSize: '16px', lineHeight: '1.6' }}>
-                    {product.description}
+                    {description}
                   </p>
                 </div>
                 {/* Scroll indicator for long descriptions */}
@@ -132,7 +148,7 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
             {/* Image Section */}
             <div className="relative aspect-square md:aspect-auto md:min-h-[400px] bg-amber-50 flex-shrink-0">
               <img
-                src={product.image}
+                src={imageSrc(product.image, 800)}
                 alt={product.name}
                 className="w-full h-full object-cover"
               />
@@ -150,11 +166,11 @@ const ProductModal = ({ product, category, isOpen, onClose, onAddToCart }) => {
                 {product.name}
               </h2>
 
-              {product.description && (
+              {description && (
                 <div className="mb-6 bg-gradient-to-b from-amber-50/80 to-amber-50/40 rounded-xl border border-amber-200/50 overflow-hidden">
                   <div className="max-h-32 overflow-y-auto overscroll-contain p-4 scrollbar-thin scrollbar-thumb-amber-300 scrollbar-track-transparent">
                     <p className="text-foreground leading-relaxed font-medium" style={{ fontSize: '17px', lineHeight: '1.7' }}>
-                      {product.description}
+                      {description}
                     </p>
                   </div>
                   {/* Scroll indicator for long descriptions */}
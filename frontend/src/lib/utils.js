@@ -1,6 +1,42 @@
 import { clsx } from "clsx";
 import { twMerge } from "tailwind-merge"
+import axios from "axios";
 
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Uploaded images are stored as "/api/images/<hash>" and served by the backend.
+// With a width, ask for a resized WebP variant: the backend resizes uploads,
+// Unsplash/Pexels URLs already accept a `w` parameter.
+export function imageSrc(url, width) {
+  if (!url) return url;
+  if (url.startsWith("/api/")) {
+    const src = `${process.env.REACT_APP_BACKEND_URL}${url}`;
+    return width ? `${src}?w=${width}&format=webp` : src;
+  }
+  if (width && /^https:\/\/images\.(unsplash|pexels)\.com\//.test(url)) {
+    const resized = new URL(url);
+    resized.searchParams.set("w", width);
+    if (resized.hostname === "images.unsplash.com") {
+      resized.searchParams.set("fm", "webp");
+    } else {
+      resized.searchParams.set("auto", "compress");
+    }
+    return resized.toString();
+  }
+  return url;
+}
+
+// List endpoints are paginated: follow X-Next-Cursor until the last page
+export async function fetchAllPages(url, config = {}) {
+  const items = [];
+  let cursor = null;
+  do {
+    const params = cursor ? { ...config.params, cursor } : config.params;
+    const response = await axios.get(url, { ...config, params });
+    items.push(...response.data);
+    cursor = response.headers["x-next-cursor"];
+  } while (cursor);
+  return items;
+}
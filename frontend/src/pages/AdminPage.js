@@ -24,6 +24,7 @@ import { FaBox, FaTh, FaChevronRight, FaPlus, FaPencilAlt, FaTrash, FaSignOutAlt
 import DeleteConfirmDialog from "@/components/custom/DeleteConfirmDialog";
 import { IconSelector } from "@/components/custom/IconSelector";
 import { DragDropContext, Droppable, Draggable } from "@hello-pangea/dnd";
+import { imageSrc, fetchAllPages } from "@/lib/utils";
 
 const ADMIN_PASSWORD = "secretboost1";
 
@@ -132,16 +133,16 @@ const AdminPage = () => {
 
   const fetchData = async () => {
     try {
-      const [catRes, prodRes, ordersRes, promoRes, aboutRes] = await Promise.all([
+      const [catRes, productList, orderList, promoRes, aboutRes] = await Promise.all([
         axios.get(`${API}/categories`),
-        axios.get(`${API}/products`),
-        axios.get(`${API}/orders`, authHeader),
+        fetchAllPages(`${API}/products`),
+        fetchAllPages(`${API}/orders`, authHeader),
         axios.get(`${API}/promocodes`, authHeader),
         axios.get(`${API}/about`)
       ]);
       setCategories(catRes.data);
-      setProducts(prodRes.data);
-      setOrders(ordersRes.data);
+      setProducts(productList);
+      setOrders(orderList);
       setPromocodes(promoRes.data);
       setAboutData(aboutRes.data);
       setAboutForm({
@@ -154,14 +155,16 @@ const AdminPage = () => {
     }
   };
 
-  const handleImageUpload = (e) => {
+  const handleImageUpload = async (e) => {
     const file = e.target.files[0];
-    if (file) {
-      const reader = new FileReader();
-      reader.onloadend = () => {
-        setProductForm(prev => ({ ...prev, image: reader.result }));
-      };
-      reader.readAsDataURL(file);
+    if (!file) return;
+    const formData = new FormData();
+    formData.append("file", file);
+    try {
+      const response = await axios.post(`${API}/images`, formData, authHeader);
+      setProductForm(prev => ({ ...prev, image: response.data.url }));
+    } catch (error) {
+      toast.error("Ошибка загрузки изображения");
     }
   };
 
@@ -755,7 +758,7 @@ const AdminPage = () => {
               <div key={product.id} className="bg-white rounded-2xl p-4 shadow-sm">
                 <div className="flex gap-4 mb-3">
                   <img 
-                    src={product.image} 
+                    src={imageSrc(product.image, 160)} 
                     alt={product.name} 
                     className="w-16 h-16 object-cover rounded-xl"
                   />
@@ -847,7 +850,7 @@ const AdminPage = () => {
                   </label>
                 </div>
                 {productForm.image && (
-                  <img src={productForm.image} alt="Preview" className="mt-2 w-24 h-24 object-cover rounded-xl" />
+                  <img src={imageSrc(productForm.image)} alt="Preview" className="mt-2 w-24 h-24 object-cover rounded-xl" />
                 )}
               </div>
               <div>